@@ -2,59 +2,298 @@
 Main function and the functions for the subcommands.
 """
 
+import os
 import signal
+import sys
 from inst import rand, sudoku
+import batch
+import bench
+import binary
+import cache
 import compare
+import components
+import dlx
 import ec
 import cli
+import estimate
+import observer
+import order
+import parallel
+import reduce
 import numpy as np
 
 args = cli.get_args()
 
 np.set_printoptions(linewidth=10000)
 
+# The results of the complete searches are kept, unless they can be resumed.
+result_cache = None
+if args.command == 'ec' and args.cache and args.checkpoint is None:
+    result_cache = cache.ResultCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+
+# The same observers follow all the searches of an instance,
+# eg of every component with --decompose. They are set by __create_observers.
+tree_stats = None
+progress = None
+search_observer = None
+
+
+def __create_observers():
+    global tree_stats, progress, search_observer  # pylint: disable=global-statement
+
+    tree_stats = observer.TreeStats() if args.stats else None
+    progress = observer.ProgressReporter(args.progress_interval) if args.progress else None
+    observers = [obs for obs in (tree_stats, progress) if obs is not None]
+    search_observer = None
+    if len(observers) == 1:
+        search_observer = observers[0]
+    elif len(observers) > 1:
+        search_observer = observer.ObserverGroup(observers)
+
+
+def __create_alg(input_matrix, count_only: bool):
+    if args.order != 'input':
+        # The search runs on the instance with the rows permuted,
+        # and its coverages are mapped back to the original rows.
+        rows = order.row_order(input_matrix, args.order)
+        return order.Ordered(rows,
+                             __create_engine(order.Ordered.permute(input_matrix, rows),
+                                             count_only),
+                             args.order)
+
+    return __create_engine(input_matrix, count_only)
+
+
+def __create_engine(input_matrix, count_only: bool):
+    if args.engine == 'dlx':
+        return dlx.DLX(input_matrix, time_limit=args.time,
+                       count_only=count_only, max_coverages=args.max_solutions)
+
+    if args.workers > 1:
+        return parallel.ParallelEC(input_matrix, time_limit=args.time,
+                                   plus=args.plus, workers=args.workers,
+                                   count_only=count_only,
+                                   max_coverages=args.max_solutions)
+
+    if progress is not None:
+        tree = estimate.estimate_tree(input_matrix, args.progress_samples, prune=args.prune)
+        progress.expect(tree.nodes, tree.nodes_error)
+
+    alg_type = ec.ECPlus if args.plus else ec.EC
+    return alg_type(input_matrix, time_limit=args.time,
+                    use_stack=args.stack, use_iterative=args.iterative,
+                    count_only=count_only, max_coverages=args.max_solutions,
+                    checkpoint_file=args.checkpoint,
+                    checkpoint_interval=args.checkpoint_interval,
+                    precompute=args.precompute, prune=args.prune,
+                    observer=search_observer, max_nodes=args.max_nodes,
+                    max_memory=args.max_memory, check_interval=args.check_interval)
 
-def __ec_cmd():
-    input_matrix, is_sudoku, dim = ec.read_from_file(args.input, args.sparse)
 
-    alg = None
-    if args.plus:
-        alg = ec.ECPlus(input_matrix, time_limit=args.time,
-                        use_stack=args.stack)
+def __create_search(input_matrix, count_only: bool):
+    if args.decompose:
+        # Every component is solved with its own algorithm.
+        decomposition = components.Decomposition(input_matrix)
+        return components.Decomposed(decomposition, __create_alg,
+                                     count_only, args.max_solutions)
+
+    return __create_alg(input_matrix, count_only)
+
+
+def __cache_options(is_sudoku: bool, dim: int) -> dict:
+    # The options that change the result or the output file. The representation
+    # of the matrix and the way the tree is explored do not change them.
+    return {'engine': args.engine, 'plus': args.plus, 'parallel': args.workers > 1,
+            'count_only': args.count_only, 'max_solutions': args.max_solutions,
+            'max_nodes': args.max_nodes, 'reduce': args.reduce, 'decompose': args.decompose,
+            'prune': args.prune, 'order': args.order, 'stats': args.stats,
+            'stream': args.stream, 'sets': args.sets,
+            'sudoku_solutions': args.sudoku_solutions, 'coverage_format': args.coverage_format,
+            'sudoku': is_sudoku, 'dim': dim}
+
+
+def __solve(input_file: str, output_file: str, handle_signals: bool = True) -> ec.Result:
+    input_matrix, is_sudoku, dim = ec.read_from_file(
+        input_file, args.sparse, args.bitset)
+
+    if result_cache is None:
+        return __search(input_matrix, is_sudoku, dim, output_file, handle_signals)
+
+    key = cache.cache_key(input_matrix, __cache_options(is_sudoku, dim))
+    result = result_cache.get(key, output_file)
+    if result is not None:
+        print(f'Result of \"{input_file}\" loaded from the cache.', flush=True)
+        return result
+
+    result = __search(input_matrix, is_sudoku, dim, output_file, handle_signals)
+    result_cache.put(key, result, output_file)
+    return result
+
+
+def __search(input_matrix, is_sudoku: bool, dim: int,  # pylint: disable=too-many-arguments
+             output_file: str, handle_signals: bool) -> ec.Result:
+    __create_observers()
+
+    if args.reduce:
+        # The search runs on the reduced instance, if anything is left of it,
+        # and its coverages are mapped back to the original one.
+        reduction = reduce.Reduction(input_matrix)
+        search_alg = None
+        if reduction.input_matrix is not None:
+            search_alg = __create_search(reduction.input_matrix,
+                                         args.count_only and not reduction.has_copies())
+        alg = reduce.Reduced(reduction, search_alg,
+                             args.count_only, args.max_solutions)
     else:
-        alg = ec.EC(input_matrix, time_limit=args.time, use_stack=args.stack)
+        search_alg = alg = __create_search(input_matrix, args.count_only)
 
-    signal.signal(signal.SIGINT, lambda *_: alg.stop())
+    if args.resume and search_alg is not None:
+        search_alg.load_checkpoint(args.checkpoint)
 
-    result = alg.start()
-    ec.write_output(output_file=args.output, input_matrix=input_matrix,
-                    result=result, is_sudoku=is_sudoku, dim=dim)
+    if handle_signals:
+        signal.signal(signal.SIGINT, lambda *_: alg.stop())
 
+    if args.stream:
+        # The coverages are written as soon as they are found,
+        # and copied to the output file with the statistics at the end.
+        coverages_file = f'{output_file}.cov'
+        ec.write_coverages(coverages_file, alg.iter_coverages(), is_sudoku)
+        ec.write_output(output_file=output_file, input_matrix=input_matrix,
+                        result=alg.result(), is_sudoku=is_sudoku, dim=dim,
+                        coverages_file=coverages_file,
+                        write_sets=args.sets, render_sudoku=args.sudoku_solutions,
+                        coverage_format=args.coverage_format)
+        os.remove(coverages_file)
+    else:
+        result = alg.start()
+        ec.write_output(output_file=output_file, input_matrix=input_matrix,
+                        result=result, is_sudoku=is_sudoku, dim=dim,
+                        write_sets=args.sets, render_sudoku=args.sudoku_solutions,
+                        coverage_format=args.coverage_format)
+
+    return alg.result()
+
+
+def __solve_in_batch(input_file: str, output_file: str) -> ec.Result:
+    # CTRL+C stops the whole batch, so it is not handled by the single searches.
+    return __solve(input_file, output_file, handle_signals=False)
+
+
+def __ec_cmd():
+    if batch.is_batch(args.input):
+        instances = batch.find_instances(args.input)
+        summary_file = args.summary or os.path.join(args.output, 'summary.csv')
+        rows = batch.run_batch(instances, args.output, __solve_in_batch,
+                               workers=args.batch_workers)
+        batch.write_summary(summary_file, rows)
+
+        print(f'Instances solved: {len(rows)} of {len(instances)}')
+        print(f'Summary file created at \"{summary_file}\".')
+        return
+
+    result = __solve(args.input, args.output)
+    print(f'Coverages found: {result.coverage_count}')
+    if result.stop_reason is not None:
+        print(f'Search stopped early, reason: {result.stop_reason}.')
     print(f'Output file created at \"{args.output}\".')
 
+    if args.checkpoint is not None and os.path.exists(args.checkpoint):
+        print(f'Checkpoint saved at \"{args.checkpoint}\", continue with --resume.')
+
 
 def __gen_cmd():
     if args.subcommand == 'rand':
-        instance = rand.gen_inst(args.mdim, args.ndim,
-                                 args.prob, args.guarantee)
-        rand.write_to_file(args.output, instance)
+        if args.batched:
+            instance = rand.gen_inst_batched(args.mdim, args.ndim, args.prob,
+                                             args.guarantee, seed=args.seed)
+        else:
+            instance = rand.gen_inst(args.mdim, args.ndim, args.prob,
+                                     args.guarantee, seed=args.seed)
+        rand.write_to_file(args.output, instance, args.binary)
     elif args.subcommand == 'sudoku':
         instance = sudoku.gen_inst(args.side_dim, args.diff)
-        sudoku.write_to_file(args.output, instance)
+        sudoku.write_to_file(args.output, instance, args.binary)
 
     print(f'Instance created at \"{args.output}\".')
 
 
+def __convert_cmd():
+    if binary.is_binary(args.input):
+        print(f'\"{args.input}\" is already a binary instance.')
+        sys.exit(1)
+
+    input_matrix, is_sudoku, dim = ec.read_from_file(args.input, use_sparse=True)
+    binary.write_binary(args.output, input_matrix.to_sparse(), is_sudoku, dim,
+                        ec.read_comments(args.input))
+
+    print(f'Instance converted at \"{args.output}\".')
+
+
+def __estimate_cmd():
+    input_matrix, _, _ = ec.read_from_file(args.input)
+    n, _ = input_matrix.shape
+    result = estimate.estimate_tree(input_matrix, args.samples,
+                                    prune=args.prune, seed=args.seed)
+
+    print(f'Estimated nodes: {result.nodes:.6g} (standard error: {result.nodes_error:.2g})')
+    print(f'Estimated coverages: {result.coverages:.6g}')
+    print(f'Total nodes: {(2**n)-1}')
+    print(f'Estimated in {result.execution_time:.3f}s with {result.samples} samples.')
+
+
+def __bench_cmd():
+    instances = bench.gen_instances(args.rand, args.sudoku, args.seed)
+    report = bench.run_bench(instances, args.engines, args.backends,
+                             repeat=args.repeat, time_limit=args.time, seed=args.seed)
+    bench.write_report(args.output, report)
+    print(f'Report created at \"{args.output}\".')
+
+    if args.baseline is not None:
+        regressions = bench.compare_reports(report, bench.read_report(args.baseline),
+                                            args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+
+        if regressions:
+            print(f'{len(regressions)} regressions with respect to \"{args.baseline}\".')
+            sys.exit(1)
+        print(f'No regressions with respect to \"{args.baseline}\".')
+
+
 def __compare_cmd():
-    all_equal, min_exec_time, min_exec_idx = compare.compare_results(
-        args.input)
+    comparison = compare.compare_results(args.input, args.workers, args.max_diffs, args.nodes)
+
+    for fingerprint in comparison.fingerprints:
+        if fingerprint.count_only:
+            print(f'{fingerprint.file_name}: {fingerprint.coverage_count} coverages '
+                  f'(count only, not listed), {fingerprint.visited_nodes} nodes visited')
+        else:
+            print(f'{fingerprint.file_name}: {fingerprint.count} coverages, '
+                  f'fingerprint {fingerprint.hash_sum:016x}{fingerprint.hash_square_sum:016x}, '
+                  f'{fingerprint.visited_nodes} nodes visited')
 
-    if not all_equal:
+    if any(fingerprint.count_only for fingerprint in comparison.fingerprints):
+        print('Only the number of coverages of the count only results is compared.')
+
+    if not comparison.all_equal:
         print('The results NOT are equal.')
-    else:
-        print('The results are equal.')
-        print(
-            f'Fastest was {args.input[min_exec_idx]} with execution time: {min_exec_time}')
+        for difference in comparison.differences:
+            print(f'{difference.file_name}: {difference.missing_count} coverages missing, '
+                  f'{difference.extra_count} extra with respect to {args.input[0]}'
+                  f'{" (count only)" if difference.count_only else ""}')
+            for coverage in difference.missing:
+                print(f'  missing {list(coverage)}')
+            for coverage in difference.extra:
+                print(f'  extra   {list(coverage)}')
+        for idx in comparison.node_differences:
+            print(f'{args.input[idx]}: {comparison.fingerprints[idx].visited_nodes} nodes visited '
+                  f'instead of {comparison.fingerprints[0].visited_nodes} of {args.input[0]}, '
+                  f'in the same search ({comparison.fingerprints[idx].search})')
+        sys.exit(1)
+
+    print('The results are equal.')
+    print(f'Fastest was {args.input[comparison.min_idx]} '
+          f'with execution time: {comparison.min_exec_time}')
 
 
 if __name__ == "__main__":
@@ -64,3 +303,9 @@ if __name__ == "__main__":
         __gen_cmd()
     elif args.command == 'compare':
         __compare_cmd()
+    elif args.command == 'convert':
+        __convert_cmd()
+    elif args.command == 'estimate':
+        __estimate_cmd()
+    elif args.command == 'bench':
+        __bench_cmd()
@@ -0,0 +1,182 @@
+"""batch.py
+Execution of the EC algorithm on many instances, on a pool of processes.
+"""
+
+import csv
+import functools
+import glob
+import json
+import math
+import os
+import signal
+from multiprocessing import Pool
+from typing import Callable, List, Tuple
+import binary
+import ec
+from ec import Result
+
+# The columns of the summary, one row per instance.
+SUMMARY_FIELDS = ['instance', 'output', 'engine', 'execution_time',
+                  'visited_nodes', 'coverage_count', 'stop_reason', 'error']
+
+
+def is_batch(input_path: str) -> bool:
+    """Check if the input of ec is a batch of instances,
+    ie a directory or a glob pattern instead of a single file.
+
+    Args:
+        input_path (str): The input of ec.
+
+    Returns:
+        bool: True if it is a batch, False otherwise.
+    """
+    return os.path.isdir(input_path) or glob.has_magic(input_path)
+
+
+def find_instances(input_path: str) -> List[str]:
+    """Finds the instance files in a directory or matching a glob pattern.
+    Only the files written by the generators are kept, so eg the outputs
+    next to the instances are skipped.
+
+    Args:
+        input_path (str): A directory or a glob pattern.
+
+    Returns:
+        List[str]: The instance files, the biggest ones (by number of elements
+                   of the input matrix) first, so that the longest searches
+                   do not trail at the end. The size of the file is not used,
+                   as a binary instance is much smaller than the same text one.
+    """
+    if os.path.isdir(input_path):
+        input_path = os.path.join(input_path, '*')
+
+    files = [file for file in glob.glob(input_path)
+             if os.path.isfile(file) and __is_instance(file)]
+
+    return sorted(files, key=lambda file: (-math.prod(ec.read_shape(file)), file))
+
+
+def output_file(output_dir: str, instance: str) -> str:
+    """Returns the output file of an instance, eg 'test/9x9x03.in.txt' -> 'out/9x9x03.out.txt'.
+    The output is always a text file, so eg 'test/9x9x03.in.bin' -> 'out/9x9x03.out.txt'.
+
+    Args:
+        output_dir (str): The directory of the outputs.
+        instance (str): The instance file.
+
+    Returns:
+        str: The path of the output file.
+    """
+    root, _ = os.path.splitext(os.path.basename(instance))
+    if root.endswith('.in'):
+        root = root[:-len('.in')]
+
+    return os.path.join(output_dir, f'{root}.out.txt')
+
+
+def run_batch(instances: List[str],
+              output_dir: str,
+              solve: Callable[[str, str], Result],
+              workers: int = 1) -> List[dict]:
+    """Solves every instance, writing its output in the output directory.
+    The instances are given to the workers one at a time and in order,
+    and each worker process is reused for many instances.
+    With CTRL+C the batch stops, and only the instances already solved are returned.
+
+    Args:
+        instances (List[str]): The instance files.
+        output_dir (str): The directory of the outputs, created if missing.
+        solve (Callable[[str, str], Result]): Solves an instance file and writes the output file.
+        workers (int, optional): Number of worker processes,
+                                 1 to solve the instances in the main process. Defaults to 1.
+
+    Raises:
+        ValueError: If two instances have the same output file, eg 'a.in.txt' and 'a.in.bin'.
+
+    Returns:
+        List[dict]: The summary of every instance solved, in the order of instances.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(instance, output_file(output_dir, instance)) for instance in instances]
+    outputs = {}
+    for instance, output in tasks:
+        if output in outputs:
+            raise ValueError(f'"{outputs[output]}" and "{instance}" have the same output "{output}"')
+        outputs[output] = instance
+
+    run_task = functools.partial(_run_task, solve)
+
+    rows = []
+    try:
+        if workers <= 1:
+            for task in tasks:
+                rows.append(run_task(task))
+                __print_row(rows[-1])
+        else:
+            with Pool(workers, initializer=_init_worker) as pool:
+                for row in pool.imap_unordered(run_task, tasks):
+                    rows.append(row)
+                    __print_row(row)
+    except KeyboardInterrupt:
+        pass
+
+    order = {instance: idx for idx, instance in enumerate(instances)}
+    return sorted(rows, key=lambda row: order[row['instance']])
+
+
+def write_summary(summary_file: str, rows: List[dict]):
+    """Writes the summary of a batch, as JSON if the file ends with .json and as CSV otherwise.
+
+    Args:
+        summary_file (str): The path of the file.
+        rows (List[dict]): The summary of every instance, from run_batch.
+    """
+    with open(summary_file, "w", encoding="utf-8", newline='') as file:
+        if summary_file.endswith('.json'):
+            json.dump(rows, file, indent=2)
+            return
+
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _run_task(solve: Callable[[str, str], Result], task: Tuple[str, str]) -> dict:
+    # Runs in the workers: only the summary is sent back, not the coverages.
+    instance, output = task
+    row = dict.fromkeys(SUMMARY_FIELDS)
+    row.update(instance=instance, output=output)
+
+    try:
+        result = solve(instance, output)
+    except (ValueError, OSError) as error:
+        row['error'] = str(error)
+        return row
+
+    row.update(engine='DLX' if result.engine == 'DLX' else ('EC plus' if result.plus else 'EC'),
+               execution_time=result.execution_time,
+               visited_nodes=result.visited_nodes,
+               coverage_count=result.coverage_count,
+               stop_reason=result.stop_reason)
+    return row
+
+
+def _init_worker():
+    # CTRL+C is handled by the main process, that stops the pool.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def __is_instance(file_name: str) -> bool:
+    if binary.is_binary(file_name):
+        return True
+
+    with open(file_name, "r", encoding="utf-8", errors="replace") as file:
+        return file.readline().startswith(';;; Exact-Cover')
+
+
+def __print_row(row: dict):
+    if row['error'] is not None:
+        print(f'{row["instance"]}: error, {row["error"]}', flush=True)
+    else:
+        print(f'{row["instance"]}: {row["coverage_count"]} coverages '
+              f'in {row["execution_time"]:.3f}s', flush=True)
@@ -0,0 +1,214 @@
+"""bench.py
+Benchmark of the EC algorithms on generated instances, and comparison with a baseline.
+"""
+
+import itertools
+import json
+from multiprocessing import Pool
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from inst import rand, sudoku
+import ec
+from input_matrix import DenseInputMatrix, SparseInputMatrix, BitsetInputMatrix
+
+BACKENDS = {
+    'dense': DenseInputMatrix,
+    'sparse': SparseInputMatrix,
+    'bitset': BitsetInputMatrix,
+}
+
+# The measures repeated for every run, summarized with the median and the spread.
+MEASURES = ['wall_time', 'cpu_time', 'nodes_per_second', 'peak_memory']
+
+
+def gen_instances(rand_grid: List[Tuple[int, int, float]],
+                  sudoku_grid: List[Tuple[int, float]],
+                  seed: int = 0) -> Dict[str, np.ndarray]:
+    """Generates the instances of the benchmark, always the same for the same seed.
+
+    Args:
+        rand_grid (List[Tuple[int, int, float]]): The (card M, card N, probability)
+                                                  of the random instances.
+        sudoku_grid (List[Tuple[int, float]]): The (dimension, difficulty) of the sudoku instances.
+        seed (int, optional): The seed of the generators. Defaults to 0.
+
+    Returns:
+        Dict[str, np.ndarray]: The input matrix of every instance, by name.
+    """
+    instances = {}
+    for card_m, card_n, prob in rand_grid:
+        __seed(seed)
+        instance = rand.gen_inst(card_m, card_n, prob, guarantee_sol=True)
+        instances[f'rand-{card_m}x{card_n}x{prob}'] = instance.input_matrix
+
+    for dim, difficulty in sudoku_grid:
+        __seed(seed)
+        instance = sudoku.gen_inst(dim, difficulty)
+        instances[f'sudoku-{dim}x{difficulty}'] = instance.input_matrix
+
+    return instances
+
+
+def run_bench(instances: Dict[str, np.ndarray],  # pylint: disable=too-many-arguments
+              engines: List[str],
+              backends: List[str],
+              repeat: int = 3,
+              time_limit: float = -1,
+              seed: int = 0) -> dict:
+    """Runs every combination of engine (EC or EC plus), backend and stack on every instance.
+    Every run is done in a new process, so that its peak memory is measured alone.
+
+    Args:
+        instances (Dict[str, np.ndarray]): The instances, from gen_instances.
+        engines (List[str]): The engines, 'ec' and/or 'plus'.
+        backends (List[str]): The backends, among the keys of BACKENDS.
+        repeat (int, optional): Number of runs of every combination. Defaults to 3.
+        time_limit (float, optional): Max execution time of every run. Defaults to -1.
+        seed (int, optional): The seed of the instances, saved in the report. Defaults to 0.
+
+    Returns:
+        dict: The report, that can be written as JSON.
+    """
+    runs = []
+    for name, matrix in instances.items():
+        for engine, backend, stack in itertools.product(engines, backends, [False, True]):
+            measures = []
+            for _ in range(repeat):
+                with Pool(1) as pool:
+                    measures.append(pool.apply(_measure, (matrix, engine == 'plus',
+                                                          backend, stack, time_limit)))
+
+            run = {
+                'instance': name,
+                'shape': list(matrix.shape),
+                'engine': 'EC plus' if engine == 'plus' else 'EC',
+                'backend': backend,
+                'stack': stack,
+                'visited_nodes': measures[0]['visited_nodes'],
+                'coverage_count': measures[0]['coverage_count'],
+                'stop_reason': measures[0]['stop_reason'],
+            }
+            for measure in MEASURES:
+                values = [m[measure] for m in measures]
+                run[measure] = {'median': statistics.median(values),
+                                'spread': max(values) - min(values)}
+            runs.append(run)
+            print(__run2str(run), flush=True)
+
+    return {'seed': seed, 'repeat': repeat, 'time_limit': time_limit, 'runs': runs}
+
+
+def compare_reports(report: dict,
+                    baseline: dict,
+                    tolerance: float = 0.2,
+                    min_difference: float = 0.01) -> List[str]:
+    """Compares a report with a baseline, run by run.
+
+    Args:
+        report (dict): The report, from run_bench.
+        baseline (dict): The baseline report.
+        tolerance (float, optional): The relative increase of the median CPU time
+                                     that is a regression. Defaults to 0.2.
+        min_difference (float, optional): The increase of the median CPU time, in seconds,
+                                          below which the runs are too short to tell.
+                                          Defaults to 0.01.
+
+    Returns:
+        List[str]: The regressions found, empty if there are none. A different number
+                   of nodes or coverages is always a regression, as the result is wrong.
+    """
+    if report['seed'] != baseline['seed']:
+        return [f'The seed {report["seed"]} is not the one of the baseline ({baseline["seed"]})']
+
+    baseline_runs = {__run_key(run): run for run in baseline['runs']}
+    regressions = []
+    for run in report['runs']:
+        base = baseline_runs.get(__run_key(run))
+        if base is None:
+            continue
+
+        key = ' '.join(map(str, __run_key(run)))
+        for field in ['visited_nodes', 'coverage_count']:
+            if run[field] != base[field] and run['stop_reason'] is None \
+                    and base['stop_reason'] is None:
+                regressions.append(f'{key}: {field} {run[field]} != {base[field]}')
+
+        cpu_time, base_cpu_time = run['cpu_time']['median'], base['cpu_time']['median']
+        if cpu_time - base_cpu_time > max(base_cpu_time * tolerance, min_difference):
+            regressions.append(f'{key}: cpu time {cpu_time:.4f}s, '
+                               f'{(cpu_time / base_cpu_time - 1) * 100:.1f}% slower '
+                               f'than the baseline ({base_cpu_time:.4f}s)')
+
+    return regressions
+
+
+def write_report(report_file: str, report: dict):
+    """Writes a report to a JSON file.
+
+    Args:
+        report_file (str): The path of the file.
+        report (dict): The report, from run_bench.
+    """
+    with open(report_file, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+
+def read_report(report_file: str) -> dict:
+    """Reads a report written by write_report.
+
+    Args:
+        report_file (str): The path of the file.
+
+    Returns:
+        dict: The report.
+    """
+    with open(report_file, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _measure(matrix: np.ndarray,
+             plus: bool,
+             backend: str,
+             stack: bool,
+             time_limit: float) -> dict:
+    # Runs in a new process, so the peak memory grows only with this run.
+    input_matrix = BACKENDS[backend](matrix)
+    alg_type = ec.ECPlus if plus else ec.EC
+
+    memory = ec.peak_memory()
+    wall_time = time.perf_counter()
+    cpu_time = time.process_time()
+    result = alg_type(input_matrix, time_limit=time_limit, use_stack=stack).start()
+    cpu_time = time.process_time() - cpu_time
+    wall_time = time.perf_counter() - wall_time
+
+    return {
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'nodes_per_second': result.visited_nodes / cpu_time if cpu_time > 0 else 0.0,
+        'peak_memory': ec.peak_memory() - memory,
+        'visited_nodes': result.visited_nodes,
+        'coverage_count': result.coverage_count,
+        'stop_reason': result.stop_reason,
+    }
+
+
+def __seed(seed: int):
+    # The random generator uses numpy, the sudoku one also the random module.
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def __run_key(run: dict) -> tuple:
+    return run['instance'], run['engine'], run['backend'], run['stack']
+
+
+def __run2str(run: dict) -> str:
+    return (f'{run["instance"]:<22} {run["engine"]:<7} {run["backend"]:<6} '
+            f'{"stack" if run["stack"] else "array":<5} '
+            f'cpu {run["cpu_time"]["median"]:.4f}s (±{run["cpu_time"]["spread"]:.4f}) '
+            f'{run["nodes_per_second"]["median"]:.0f} nodes/s '
+            f'{run["peak_memory"]["median"]:.1f} MB')
@@ -0,0 +1,154 @@
+"""binary.py
+Compact binary format of the instances, read through memory mapping.
+"""
+
+import json
+import os
+import struct
+from typing import List, Tuple
+import numpy as np
+from scipy import sparse
+
+# The first bytes of every binary instance, never found at the start of a text one.
+MAGIC = b'\x93ECBIN\r\n'
+VERSION = 2
+
+# The type of the values of the matrix (all ones) in every version.
+__DATA_DTYPES = {1: np.int64, 2: np.uint8}
+
+# magic, version, flags, dimension of the sudoku, rows, columns, ones,
+# size of the indexes and size of the comments, padded to 64 bytes.
+__HEADER = struct.Struct('<8sIIqqqqII')
+__HEADER_SIZE = 64
+__FLAG_SUDOKU = 1
+
+
+def is_binary(input_file: str) -> bool:
+    """Check if an instance file is in the binary format.
+
+    Args:
+        input_file (str): The path of the file.
+
+    Returns:
+        bool: True if the file starts with MAGIC, False otherwise.
+    """
+    with open(input_file, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write_binary(output_file: str,
+                 input_matrix,
+                 is_sudoku: bool = False,
+                 dim: int = 0,
+                 comments: List[str] = None):
+    """Writes an instance in the binary format.
+
+    The file is a header, the comments as JSON and then the CSR arrays of the matrix:
+    the row pointers and the column indexes (int32, or int64 if they do not fit)
+    and the values, all ones as uint8 (int64 in version 1). Every array starts
+    at a multiple of 8 bytes, so it can be mapped in memory as it is.
+
+    Args:
+        output_file (str): The path of the file.
+        input_matrix (np.ndarray or sparse.spmatrix): The input matrix, of zeros and ones.
+        is_sudoku (bool, optional): True if the instance is a sudoku. Defaults to False.
+        dim (int, optional): The dimension of the sudoku. Defaults to 0.
+        comments (List[str], optional): The comments of the instance, eg from the generator,
+                                        without the leading ';;;'. Defaults to None.
+    """
+    rows = sparse.csr_matrix(input_matrix, dtype=np.uint8)
+    rows.eliminate_zeros()
+    rows.sort_indices()
+
+    n, m = rows.shape
+    index_dtype = np.int32 if max(rows.nnz, m) <= np.iinfo(np.int32).max else np.int64
+    meta = json.dumps(comments or []).encode()
+
+    header = __HEADER.pack(MAGIC, VERSION, __FLAG_SUDOKU if is_sudoku else 0,
+                           dim, n, m, rows.nnz, np.dtype(index_dtype).itemsize, len(meta))
+
+    with open(output_file, "wb") as file:
+        file.write(header.ljust(__HEADER_SIZE, b'\0'))
+        file.write(meta.ljust(__align(len(meta)), b'\0'))
+        for array in (rows.indptr.astype(index_dtype),
+                      rows.indices.astype(index_dtype),
+                      np.ones(rows.nnz, dtype=__DATA_DTYPES[VERSION])):
+            data = array.tobytes()
+            file.write(data.ljust(__align(len(data)), b'\0'))
+
+
+def read_shape(input_file: str) -> Tuple[int, int]:
+    """Reads the shape of the matrix of a binary instance, from its header only.
+
+    Args:
+        input_file (str): The path of the file.
+
+    Raises:
+        ValueError: If the file is not a binary instance.
+
+    Returns:
+        Tuple[int, int]: The number of rows and of columns of the input matrix.
+    """
+    with open(input_file, "rb") as file:
+        header = file.read(__HEADER_SIZE)
+    if len(header) < __HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError(f'"{input_file}" is not a binary instance')
+
+    _, _, _, _, n, m, _, _, _ = __HEADER.unpack_from(header)
+    return n, m
+
+
+def read_binary(input_file: str) -> Tuple[sparse.csr_matrix, bool, int, List[str]]:
+    """Reads an instance in the binary format.
+
+    The arrays of the matrix are mapped in memory and not copied, so the instance
+    is loaded at once and its pages are shared by all the processes that read it.
+    The mapping is copy on write, so the matrix can be changed without changing the file.
+    The files of version 1 are read too, with the values as int64.
+
+    Args:
+        input_file (str): The path of the file.
+
+    Raises:
+        ValueError: If the file is not a binary instance.
+
+    Returns:
+        Tuple[sparse.csr_matrix, bool, int, List[str]]: The input matrix,
+            True if it is a sudoku, the dimension of the sudoku and the comments.
+    """
+    with open(input_file, "rb") as file:
+        header = file.read(__HEADER_SIZE)
+        if len(header) < __HEADER_SIZE or not header.startswith(MAGIC):
+            raise ValueError(f'"{input_file}" is not a binary instance')
+
+        _, version, flags, dim, n, m, nnz, index_size, meta_size = \
+            __HEADER.unpack_from(header)
+        if version not in __DATA_DTYPES:
+            raise ValueError(f'Unsupported version {version} of the binary instance "{input_file}"')
+
+        comments = json.loads(file.read(meta_size).decode()) if meta_size > 0 else []
+
+    index_dtype = np.int32 if index_size == 4 else np.int64
+    offset = __HEADER_SIZE + __align(meta_size)
+
+    arrays = []
+    for dtype, count in ((index_dtype, n + 1), (index_dtype, nnz),
+                         (__DATA_DTYPES[version], nnz)):
+        size = count * np.dtype(dtype).itemsize
+        if offset + size > os.path.getsize(input_file):
+            raise ValueError(f'The binary instance "{input_file}" is truncated')
+        # np.memmap cannot map 0 bytes.
+        arrays.append(np.memmap(input_file, dtype=dtype, mode='c', offset=offset, shape=(count,))
+                      if count > 0 else np.zeros(0, dtype=dtype))
+        offset += __align(size)
+
+    indptr, indices, data = arrays
+    rows = sparse.csr_matrix((data, indices, indptr), shape=(n, m), copy=False)
+    # The indexes were sorted when written, so scipy does not sort them again.
+    rows.has_sorted_indices = True
+
+    return rows, bool(flags & __FLAG_SUDOKU), dim, comments
+
+
+def __align(size: int) -> int:
+    return (size + 7) // 8 * 8
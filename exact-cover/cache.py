@@ -0,0 +1,141 @@
+"""cache.py
+Cache on disk of the results of the EC algorithm, by the content of the instance.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Optional
+import numpy as np
+from ec import Result
+from input_matrix import InputMatrix
+
+
+def cache_key(input_matrix: InputMatrix, options: dict) -> str:
+    """Computes the key of a result in the cache.
+    It depends only on the content of the matrix, and not on its representation
+    or on the file it was read from.
+
+    Args:
+        input_matrix (InputMatrix): The input matrix.
+        options (dict): The options that change the result, eg the engine. Must be JSON.
+
+    Returns:
+        str: The hex digest of the matrix and of the options.
+    """
+    rows = input_matrix.to_sparse().tocsr()
+    rows.eliminate_zeros()
+    rows.sort_indices()
+
+    digest = hashlib.sha1(str(rows.shape).encode())
+    digest.update(np.asarray(rows.indptr, dtype=np.int64).tobytes())
+    digest.update(np.asarray(rows.indices, dtype=np.int64).tobytes())
+    digest.update(json.dumps(options, sort_keys=True).encode())
+
+    return digest.hexdigest()
+
+
+def is_complete(result: Result) -> bool:
+    """Check if a result is the one of a whole search,
+    ie it was not stopped by hand or by one of its budgets.
+
+    Args:
+        result (Result): The result.
+
+    Returns:
+        bool: True if the search is complete, False otherwise.
+    """
+    return result.stop_reason is None and not result.stopped and not result.time_limit_reached
+
+
+class ResultCache:
+    """A cache of the results of complete searches, in a directory.
+
+    Every entry is the result, without the coverages, and the output file written from it.
+    When the entries take more than max_size bytes, the least recently used ones are removed.
+    Entries are written atomically, so many processes can share the cache.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self.__directory = directory
+        self.__max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str, output_file: str) -> Optional[Result]:
+        """Looks for a result in the cache, and copies its output file.
+
+        Args:
+            key (str): The key of the result, from cache_key.
+            output_file (str): Where to copy the output file.
+
+        Returns:
+            Result: The result, without the coverages. None if it is not in the cache.
+        """
+        result_file, cached_output = self.__files(key)
+        try:
+            with open(result_file, "rb") as file:
+                result = pickle.load(file)
+            shutil.copyfile(cached_output, output_file)
+        except FileNotFoundError:
+            return None
+
+        # The entry was used, so it is the last one to be removed.
+        os.utime(result_file)
+        return result
+
+    def put(self, key: str, result: Result, output_file: str):
+        """Adds a result to the cache, if the search is complete.
+
+        Args:
+            key (str): The key of the result, from cache_key.
+            result (Result): The result.
+            output_file (str): The output file written from the result.
+        """
+        if not is_complete(result):
+            return
+
+        result_file, cached_output = self.__files(key)
+        shutil.copyfile(output_file, f'{cached_output}.tmp')
+        os.replace(f'{cached_output}.tmp', cached_output)
+
+        # The result is written last, as it tells that the entry is there.
+        with open(f'{result_file}.tmp', "wb") as file:
+            pickle.dump(dataclasses.replace(result, coverages=[]), file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{result_file}.tmp', result_file)
+
+        self.__evict()
+
+    def __files(self, key: str):
+        return (os.path.join(self.__directory, f'{key}.pkl'),
+                os.path.join(self.__directory, f'{key}.txt'))
+
+    def __evict(self):
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.__directory):
+            if not name.endswith('.pkl'):
+                continue
+
+            result_file, cached_output = self.__files(name[:-4])
+            try:
+                size = os.path.getsize(result_file) + os.path.getsize(cached_output)
+                entries.append((os.path.getmtime(result_file), size, result_file, cached_output))
+            except FileNotFoundError:
+                # Removed by another process.
+                continue
+            total_size += size
+
+        for _, size, result_file, cached_output in sorted(entries):
+            if total_size <= self.__max_size:
+                break
+
+            for file in (result_file, cached_output):
+                try:
+                    os.remove(file)
+                except FileNotFoundError:
+                    pass
+            total_size -= size
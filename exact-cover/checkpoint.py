@@ -0,0 +1,82 @@
+"""checkpoint.py
+Checkpoints of the EC algorithm, to resume a search that was stopped.
+"""
+
+from dataclasses import dataclass, field
+import hashlib
+import os
+import pickle
+from typing import Optional
+import numpy as np
+from input_matrix import InputMatrix
+
+
+@dataclass
+class Checkpoint:  # pylint: disable=too-many-instance-attributes
+    """Represents the state of a stopped EC search.
+
+    The search continues from the pair (i, j) of the outer loops,
+    after exploring the subtrees in the frontier (in order).
+    If j is None, row i has not been visited yet.
+    """
+
+    fingerprint: str
+    plus: bool
+    count_only: bool
+    i: int
+    j: Optional[int]
+    frontier: list
+    columns: list
+    coverages: list = field(default_factory=list)
+    visited_nodes: int = 0
+    pruned_nodes: int = 0
+    coverage_count: int = 0
+    execution_time: float = 0.0
+    precompute: bool = False
+    prune: bool = False
+
+
+def fingerprint(input_matrix: InputMatrix) -> str:
+    """Computes a fingerprint of the input matrix,
+    to check that a checkpoint belongs to the same instance.
+
+    Args:
+        input_matrix (InputMatrix): The input matrix.
+
+    Returns:
+        str: The hex digest of the rows of the matrix.
+    """
+    digest = hashlib.sha1(str(input_matrix.shape).encode())
+    for row in input_matrix:
+        digest.update(np.asarray(row, dtype=np.uint8).tobytes())
+
+    return digest.hexdigest()
+
+
+def write_checkpoint(checkpoint_file: str, checkpoint: Checkpoint):
+    """Writes a checkpoint to a file.
+    The file is replaced atomically, so a crash while writing
+    leaves the previous checkpoint intact.
+
+    Args:
+        checkpoint_file (str): The path of the file.
+        checkpoint (Checkpoint): The checkpoint.
+    """
+    temp_file = f'{checkpoint_file}.tmp'
+    with open(temp_file, "wb") as file:
+        pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(temp_file, checkpoint_file)
+
+
+def read_checkpoint(checkpoint_file: str) -> Checkpoint:
+    """Reads a checkpoint from a file written by write_checkpoint.
+
+    Args:
+        checkpoint_file (str): The path of the file.
+
+    Returns:
+        Checkpoint: The checkpoint.
+    """
+    with open(checkpoint_file, "rb") as file:
+        return pickle.load(file)
@@ -3,6 +3,9 @@ Provides the cli for the program.
 """
 
 import argparse
+import os
+import batch
+import output
 
 # Main parser
 __parser = argparse.ArgumentParser(prog="exact-cover")
@@ -15,36 +18,199 @@ __parser_ec = __subparser.add_parser('ec',
 __parser_ec.add_argument("-i",
                          "--input",
                          type=str,
-                         help="Input file.",
+                         help="Input file, or a directory or a glob pattern "
+                              "of many instances to solve in batch.",
                          default="test/in.txt")
 __parser_ec.add_argument("-o",
                          "--output",
                          type=str,
-                         help="Output file.",
+                         help="Output file, or the directory of the outputs in batch.",
                          default="test/out.txt")
 __parser_ec.add_argument("-t",
                          "--time",
                          type=float,
                          help="Max execution time.",
                          default=-1)
+__parser_ec.add_argument("-e",
+                         "--engine",
+                         type=str,
+                         help="Search engine: EC (or EC plus) or Dancing Links.",
+                         choices=['ec', 'dlx'],
+                         default='ec')
 __parser_ec.add_argument("-p",
                          "--plus",
                          type=bool,
                          help="Use EC plus instead of basic algorithm.",
                          action=argparse.BooleanOptionalAction,
                          default=False)
-__parser_ec.add_argument("-s",
-                         "--sparse",
-                         type=bool,
-                         help="Use sparse matrix representation.",
-                         action=argparse.BooleanOptionalAction,
-                         default=False)
+__backend_ec = __parser_ec.add_mutually_exclusive_group()
+__backend_ec.add_argument("-s",
+                          "--sparse",
+                          type=bool,
+                          help="Use sparse matrix representation.",
+                          action=argparse.BooleanOptionalAction,
+                          default=False)
+__backend_ec.add_argument("-b",
+                          "--bitset",
+                          type=bool,
+                          help="Use bitset matrix representation.",
+                          action=argparse.BooleanOptionalAction,
+                          default=False)
 __parser_ec.add_argument("-k",
                          "--stack",
                          type=bool,
                          help="Use stack for indices.",
                          action=argparse.BooleanOptionalAction,
                          default=False)
+__parser_ec.add_argument("-r",
+                         "--iterative",
+                         type=bool,
+                         help="Explore the tree without recursion.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("-d",
+                         "--reduce",
+                         type=bool,
+                         help="Reduce the instance before the search "
+                              "(empty, duplicate and forced rows).",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("-x",
+                         "--decompose",
+                         type=bool,
+                         help="Solve separately the components of the instance that share no columns.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("-u",
+                         "--prune",
+                         type=bool,
+                         help="Cut the subtrees where an uncovered column has no compatible row left.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("-n",
+                         "--order",
+                         type=str,
+                         help="Order of the rows visited by the search: as in the input, "
+                              "by decreasing cardinality, by rarest column first "
+                              "or by increasing degree in the compatibility graph.",
+                         choices=['input', 'cardinality', 'rarest', 'degree'],
+                         default='input')
+__parser_ec.add_argument("-a",
+                         "--precompute",
+                         type=bool,
+                         help="Build the compatibility matrix at once from the product A * A^T.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("-c",
+                         "--count-only",
+                         type=bool,
+                         help="Only count the coverages, without listing them.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("-m",
+                         "--max-solutions",
+                         type=int,
+                         help="Stop after this many coverages, negative for no limit.",
+                         default=-1)
+__parser_ec.add_argument("--max-nodes",
+                         type=int,
+                         help="Stop after visiting this many nodes, negative for no limit.",
+                         default=-1)
+__parser_ec.add_argument("--max-memory",
+                         type=float,
+                         help="Stop when the peak memory exceeds this many MB, negative for no limit.",
+                         default=-1)
+__parser_ec.add_argument("--check-interval",
+                         type=int,
+                         help="Nodes between two checks of the time and memory budgets.",
+                         default=1024)
+__parser_ec.add_argument("--stats",
+                         type=bool,
+                         help="Collect statistics of the search tree and write them "
+                              "as JSON in the header of the output file.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("--progress",
+                         type=bool,
+                         help="Print the progress of the search, with the time left "
+                              "from an estimate of the size of the tree: the time left "
+                              "is an estimate too, and can be far off on irregular trees.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("--progress-interval",
+                         type=float,
+                         help="Seconds between two progress reports.",
+                         default=5)
+__parser_ec.add_argument("--progress-samples",
+                         type=int,
+                         help="Number of random paths used to estimate the size of the tree "
+                              "for --progress: more paths take longer, "
+                              "but give a more accurate time left.",
+                         default=100000)
+__parser_ec.add_argument("--checkpoint",
+                         type=str,
+                         help="File where the state of the search is saved, to resume it.",
+                         default=None)
+__parser_ec.add_argument("--checkpoint-interval",
+                         type=float,
+                         help="Seconds between two checkpoints.",
+                         default=60)
+__parser_ec.add_argument("--resume",
+                         type=bool,
+                         help="Continue the search saved in the checkpoint file.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("-w",
+                         "--stream",
+                         type=bool,
+                         help="Write the coverages to OUTPUT.cov as soon as they are found.",
+                         action=argparse.BooleanOptionalAction,
+                         default=True)
+__parser_ec.add_argument("--sets",
+                         type=bool,
+                         help="Write the sets of the input matrix in the output file.",
+                         action=argparse.BooleanOptionalAction,
+                         default=True)
+__parser_ec.add_argument("--sudoku-solutions",
+                         type=bool,
+                         help="Write the sudoku of every coverage in the output file.",
+                         action=argparse.BooleanOptionalAction,
+                         default=True)
+__parser_ec.add_argument("--coverage-format",
+                         type=str,
+                         help="Format of the coverages in the output file, "
+                              "binary and compressed are NumPy archives.",
+                         choices=output.COVERAGE_FORMATS,
+                         default='text')
+__parser_ec.add_argument("-j",
+                         "--workers",
+                         type=int,
+                         help="Number of worker processes for EC, 1 to run it in the main process.",
+                         default=1)
+__parser_ec.add_argument("--cache",
+                         type=bool,
+                         help="Reuse the results of complete searches of the same instance "
+                              "and options, kept in CACHE_DIR.",
+                         action=argparse.BooleanOptionalAction,
+                         default=False)
+__parser_ec.add_argument("--cache-dir",
+                         type=str,
+                         help="Directory of the cached results.",
+                         default=os.path.join(os.path.expanduser('~'), '.cache', 'exact-cover'))
+__parser_ec.add_argument("--cache-size",
+                         type=float,
+                         help="Max size of the cached results in MB, "
+                              "the least recently used are removed first.",
+                         default=1024)
+__parser_ec.add_argument("--batch-workers",
+                         type=int,
+                         help="Number of worker processes solving the instances of a batch.",
+                         default=1)
+__parser_ec.add_argument("--summary",
+                         type=str,
+                         help="Summary file of a batch, JSON if it ends with .json and CSV otherwise. "
+                              "If not given, summary.csv in the directory of the outputs.",
+                         default=None)
 
 # Parser for the gen subcommand
 __parser_gen = __subparser.add_parser('gen',
@@ -85,6 +251,23 @@ __parser_rand.add_argument("-g",
                              action=argparse.BooleanOptionalAction,
                              default=False)
 
+__parser_rand.add_argument("--batched",
+                           type=bool,
+                           help="Draw the rows in batches, redrawing only the duplicated ones. "
+                                "Much faster, but gives other instances than --no-batched for the same seed.",
+                           action=argparse.BooleanOptionalAction,
+                           default=True)
+__parser_rand.add_argument("--seed",
+                           type=int,
+                           help="Seed of the generator, the same seed gives the same instance.",
+                           default=None)
+__parser_rand.add_argument("-b",
+                           "--binary",
+                           type=bool,
+                           help="Write the instance in the binary format, see the convert command.",
+                           action=argparse.BooleanOptionalAction,
+                           default=False)
+
 # Parser for the sudoku gen subcommand
 __parser_sudoku = __subparser_gen.add_parser('sudoku',
                                              help='sudoku help',
@@ -106,6 +289,13 @@ __parser_sudoku.add_argument("-d",
                              help="Difficulty of the sudoku puzzle, between 0 and 1.",
                              default=0.3)
 
+__parser_sudoku.add_argument("-b",
+                             "--binary",
+                             type=bool,
+                             help="Write the instance in the binary format, see the convert command.",
+                             action=argparse.BooleanOptionalAction,
+                             default=False)
+
 # Parser for the compare subcommand
 __parser_check = __subparser.add_parser('compare',
                                         help='compare help',
@@ -115,7 +305,133 @@ __parser_check.add_argument("-i",
                             type=str,
                             nargs="+",
                             help="Input files.")
+__parser_check.add_argument("-j",
+                            "--workers",
+                            type=int,
+                            help="Number of processes reading the files, "
+                                 "by default one per file up to the number of CPUs.",
+                            default=None)
+__parser_check.add_argument("--max-diffs",
+                            type=int,
+                            help="Max number of missing and of extra coverages shown per file.",
+                            default=5)
+__parser_check.add_argument("--nodes",
+                            type=bool,
+                            help="Compare the visited nodes of the results of the same search.",
+                            action=argparse.BooleanOptionalAction,
+                            default=True)
 
+# Parser for the bench subcommand
+def __rand_spec(value: str) -> tuple:
+    try:
+        card_m, card_n, prob = value.split('x')
+        return int(card_m), int(card_n), float(prob)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"'{value}' is not MxNxP, eg 10x20x0.3") from error
+
+
+def __sudoku_spec(value: str) -> tuple:
+    try:
+        dim, difficulty = value.split('x')
+        return int(dim), float(difficulty)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"'{value}' is not DIMxDIFF, eg 4x0.5") from error
+
+
+__parser_bench = __subparser.add_parser('bench',
+                                        help='bench help',
+                                        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+__parser_bench.add_argument("-o",
+                            "--output",
+                            type=str,
+                            help="JSON file where to save the report.",
+                            default="test/bench.json")
+__parser_bench.add_argument("--rand",
+                            type=__rand_spec,
+                            nargs="*",
+                            help="Random instances, as MxNxP (cardinality of M and N, probability).",
+                            default=[(10, 20, 0.3), (12, 24, 0.2)])
+__parser_bench.add_argument("--sudoku",
+                            type=__sudoku_spec,
+                            nargs="*",
+                            help="Sudoku instances, as DIMxDIFF (dimension, difficulty), eg 4x0.5.",
+                            default=[])
+__parser_bench.add_argument("-e",
+                            "--engines",
+                            type=str,
+                            nargs="+",
+                            choices=['ec', 'plus'],
+                            help="Engines to run: EC and/or EC plus.",
+                            default=['ec', 'plus'])
+__parser_bench.add_argument("--backends",
+                            type=str,
+                            nargs="+",
+                            choices=['dense', 'sparse', 'bitset'],
+                            help="Matrix representations to run.",
+                            default=['dense', 'sparse'])
+__parser_bench.add_argument("-r",
+                            "--repeat",
+                            type=int,
+                            help="Number of runs of every combination.",
+                            default=3)
+__parser_bench.add_argument("-t",
+                            "--time",
+                            type=float,
+                            help="Max execution time of every run.",
+                            default=-1)
+__parser_bench.add_argument("--seed",
+                            type=int,
+                            help="Seed of the generated instances.",
+                            default=0)
+__parser_bench.add_argument("--baseline",
+                            type=str,
+                            help="JSON report to compare with: the command fails on regressions.",
+                            default=None)
+__parser_bench.add_argument("--tolerance",
+                            type=float,
+                            help="Relative increase of the CPU time that is a regression.",
+                            default=0.2)
+
+# Parser for the estimate subcommand
+__parser_estimate = __subparser.add_parser('estimate',
+                                           help='estimate help',
+                                           formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+__parser_estimate.add_argument("-i",
+                               "--input",
+                               type=str,
+                               help="Input file.",
+                               default="test/in.txt")
+__parser_estimate.add_argument("-n",
+                               "--samples",
+                               type=int,
+                               help="Number of random paths from the root of the tree.",
+                               default=1000)
+__parser_estimate.add_argument("-u",
+                               "--prune",
+                               type=bool,
+                               help="Estimate the tree of EC with --prune.",
+                               action=argparse.BooleanOptionalAction,
+                               default=False)
+__parser_estimate.add_argument("--seed",
+                               type=int,
+                               help="Seed of the random paths.",
+                               default=None)
+
+
+# Parser for the convert subcommand
+__parser_convert = __subparser.add_parser('convert',
+                                          help='convert help',
+                                          formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+__parser_convert.add_argument("-i",
+                              "--input",
+                              type=str,
+                              help="Input file, in the text format.",
+                              default="test/in.txt")
+__parser_convert.add_argument("-o",
+                              "--output",
+                              type=str,
+                              help="Output file, in the binary format.",
+                              default="test/in.bin")
 
 def get_args() -> argparse.Namespace:
     """Get the arguments from the cli.
@@ -127,4 +443,33 @@ def get_args() -> argparse.Namespace:
     if not args.command:
         __parser.error('No arguments provided.')
 
+    if args.command == 'ec' and (args.engine != 'ec' or args.workers > 1):
+        if args.checkpoint is not None:
+            __parser.error('Checkpoints are only supported by EC in the main process.')
+        if args.precompute:
+            __parser.error('--precompute is only supported by EC in the main process.')
+        if args.prune:
+            __parser.error('--prune is only supported by EC in the main process.')
+        if args.stats:
+            __parser.error('--stats is only supported by EC in the main process.')
+        if args.progress:
+            __parser.error('--progress is only supported by EC in the main process.')
+        if args.max_nodes >= 0 or args.max_memory >= 0:
+            __parser.error('Node and memory budgets are only supported by EC in the main process.')
+
+    if args.command == 'ec' and args.decompose and args.checkpoint is not None:
+        __parser.error('Checkpoints cannot be used with --decompose.')
+
+    if args.command == 'ec' and args.resume and args.checkpoint is None:
+        __parser.error('--resume requires --checkpoint.')
+
+    if args.command == 'ec' and batch.is_batch(args.input):
+        if args.workers > 1 and args.batch_workers > 1:
+            __parser.error('-j cannot be used with --batch-workers, '
+                           'as the workers of a batch cannot start other processes.')
+        if args.checkpoint is not None:
+            __parser.error('Checkpoints cannot be used with a batch of instances.')
+        if args.progress:
+            __parser.error('--progress cannot be used with a batch of instances.')
+
     return args
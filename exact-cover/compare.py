@@ -1,39 +1,377 @@
-"""check.py
+"""compare.py
 Utility functions to check the outputs of EC and EC plus algorithms.
 """
 
-from typing import Tuple
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+import os
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+import zipfile
+import numpy as np
 import ec
+import output
 
+# Number of bytes of coverages read at once from a text file,
+# and number of coverages read at once from a binary one.
+__CHUNK_BYTES = 1 << 22
+__CHUNK_COVERAGES = 1 << 16
 
-def compare_results(input_files: list) -> Tuple[bool, float, int]:
+__MASK = (1 << 64) - 1
+
+
+@dataclass
+class Fingerprint:
+    """Represents the coverages of an output file, regardless of their order."""
+
+    file_name: str
+    count: int
+    hash_sum: int
+    hash_square_sum: int
+    execution_time: float
+    visited_nodes: int
+    coverage_count: int = 0
+    count_only: bool = False
+    search: str = ''
+    stopped: bool = False
+
+    def same_coverages(self, other: 'Fingerprint') -> bool:
+        """Check if the coverages of two files are the same, regardless of their order.
+        If a file has only the number of coverages (count only), only the numbers are compared.
+
+        Args:
+            other (Fingerprint): The fingerprint of the other file.
+
+        Returns:
+            bool: True if the coverages are the same (but for a hash collision), False otherwise.
+        """
+        if self.coverage_count != other.coverage_count:
+            return False
+
+        if self.count_only or other.count_only:
+            return True
+
+        return (self.count, self.hash_sum, self.hash_square_sum) \
+            == (other.count, other.hash_sum, other.hash_square_sum)
+
+    def same_search(self, other: 'Fingerprint') -> bool:
+        """Check if two files come from the same complete search, that must visit the same nodes.
+
+        Args:
+            other (Fingerprint): The fingerprint of the other file.
+
+        Returns:
+            bool: True if the visited nodes of the two files can be compared, False otherwise.
+        """
+        return self.search == other.search and not self.stopped and not other.stopped
+
+
+@dataclass
+class Difference:
+    """Represents the coverages that differ between an output file and the first one."""
+
+    file_name: str
+    missing: List[Tuple[int, ...]] = field(default_factory=list)
+    extra: List[Tuple[int, ...]] = field(default_factory=list)
+    missing_count: int = 0
+    extra_count: int = 0
+    count_only: bool = False
+
+
+@dataclass
+class Comparison:
+    """Represents the comparison of many output files."""
+
+    all_equal: bool
+    min_exec_time: float
+    min_idx: int
+    fingerprints: List[Fingerprint]
+    differences: List[Difference]
+    node_differences: List[int] = field(default_factory=list)
+
+
+def compare_results(input_files: list,
+                    workers: Optional[int] = None,
+                    max_diffs: int = 5,
+                    compare_nodes: bool = True) -> Comparison:
     """Compares the EC results in the input files.
-    Will return an error if the results are not equal, ie
-    they refer to different problems.
+    The results are equal if they have the same number of coverages in the header
+    and the same coverages, in any order: every file is streamed once,
+    with every coverage sorted and hashed, and only the fingerprints of the files are compared.
+    If they differ, the files are streamed again to find the differing coverages.
+    The results with only the number of coverages (count only) are compared by that number.
+
+    With compare_nodes, the results of the same complete search (same engine, where
+    EC and EC plus are the same, row order, pruning, reduction and decomposition)
+    must also have visited the same nodes.
 
     Args:
         input_files (list): The file containing the results to compare.
+        workers (int, optional): Number of processes, every one reading a file at a time.
+                                 Defaults to one per file, up to the number of CPUs.
+        max_diffs (int, optional): Max number of missing and of extra coverages reported
+                                   for every file. Defaults to 5.
+        compare_nodes (bool, optional): Compare the visited nodes of the results
+                                        of the same search. Defaults to True.
 
     Returns:
-        bool: True if all the results are equal, False otherwise.
-        float: The execution time of the fastest algorithm.
-        int: The index of the fastest algorithm.
+        Comparison: If all the results are equal, the fastest algorithm and its execution time,
+                    the coverages that differ from the first file and the files
+                    that visited different nodes than the first one in the same search.
     """
+    if workers is None:
+        workers = min(len(input_files), os.cpu_count() or 1)
+
+    fingerprints = __map(fingerprint, input_files, workers)
+
+    min_idx = min(range(len(fingerprints)), key=lambda idx: fingerprints[idx].execution_time)
+    first = fingerprints[0]
+    different = [idx for idx, other in enumerate(fingerprints)
+                 if not other.same_coverages(first)]
+    node_differences = [idx for idx, other in enumerate(fingerprints)
+                        if compare_nodes and other.same_search(first)
+                        and other.visited_nodes != first.visited_nodes]
+
+    # Without the coverages of a file, only the numbers of coverages differ.
+    differences = [__count_diff(first, fingerprints[idx]) for idx in different
+                   if first.count_only or fingerprints[idx].count_only]
+    listed = [idx for idx in different
+              if not first.count_only and not fingerprints[idx].count_only]
+    if listed:
+        # The hashes of every coverage, sorted, so that the multisets can be compared.
+        hashes = __map(sorted_hashes, [input_files[0]] + [input_files[idx] for idx in listed],
+                       workers)
+        for idx, other_hashes in zip(listed, hashes[1:]):
+            differences.append(__diff(input_files[0], input_files[idx],
+                                      hashes[0], other_hashes, max_diffs))
+
+    return Comparison(all_equal=not different and not node_differences,
+                      min_exec_time=fingerprints[min_idx].execution_time,
+                      min_idx=min_idx,
+                      fingerprints=fingerprints,
+                      differences=differences,
+                      node_differences=node_differences)
+
+
+def fingerprint(file_name: str) -> Fingerprint:
+    """Computes the fingerprint of the coverages of an output file,
+    ie their number and the sums of their hashes (and of their squares, mixed) modulo 2^64,
+    along with the number of coverages in the header and the search that found them.
+
+    Args:
+        file_name (str): The path of the output file.
+
+    Returns:
+        Fingerprint: The fingerprint of the file.
+    """
+    result = ec.read_result(file_name, with_coverages=False)
+
+    count = hash_sum = hash_square_sum = 0
+    for values, lengths in iter_coverages(file_name):
+        hashes = hash_coverages(values, lengths)
+        count += len(hashes)
+        hash_sum = (hash_sum + int(hashes.sum(dtype=np.uint64))) & __MASK
+        hash_square_sum = (hash_square_sum +
+                           int(__mix(hashes ^ np.uint64(0x9e3779b97f4a7c15)).sum(dtype=np.uint64))
+                           ) & __MASK
+
+    # The files of older versions have no number of coverages in the header,
+    # while in the others it is 0 only if no coverage is listed.
+    coverage_count = result.coverage_count
+    if not result.count_only and coverage_count == 0:
+        coverage_count = count
+
+    return Fingerprint(file_name=file_name,
+                       count=count,
+                       hash_sum=hash_sum,
+                       hash_square_sum=hash_square_sum,
+                       execution_time=result.execution_time,
+                       visited_nodes=result.visited_nodes,
+                       coverage_count=coverage_count,
+                       count_only=result.count_only,
+                       search=__search_name(result),
+                       stopped=result.stopped or result.stop_reason is not None)
+
+
+def sorted_hashes(file_name: str) -> np.ndarray:
+    """Computes the hash of every coverage of an output file, 8 bytes per coverage.
+
+    Args:
+        file_name (str): The path of the output file.
+
+    Returns:
+        np.ndarray: The sorted hashes.
+    """
+    hashes = [hash_coverages(values, lengths) for values, lengths in iter_coverages(file_name)]
+    return np.sort(np.concatenate(hashes)) if hashes else np.zeros(0, dtype=np.uint64)
+
+
+def iter_coverages(file_name: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Reads the coverages of an output file a batch at a time,
+    in any of the formats written by ec.write_output.
+
+    Args:
+        file_name (str): The path of the output file.
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray]: The rows of the coverages in the batch (1-based),
+                                       and the number of rows of every coverage.
+    """
+    with open(file_name, 'rb') as file:
+        for line in file:
+            if line.startswith(b';;; Exact Coverages'):
+                break
+
+        start = file.tell()
+        if not file.readline().startswith(b';;; Coverages format:'):
+            file.seek(start)
+            yield from __iter_text(file)
+            return
+
+        # The .npz archive is after the header, and zipfile skips what is before it.
+        with zipfile.ZipFile(file) as archive:
+            yield from __iter_binary(archive)
+
+
+def hash_coverages(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Hashes every coverage as a sorted tuple, so the order of its rows does not matter.
+
+    Args:
+        values (np.ndarray): The rows of all the coverages.
+        lengths (np.ndarray): The number of rows of every coverage.
+
+    Returns:
+        np.ndarray: The 64 bit hash of every coverage.
+    """
+    ids, values = __canonical(values, lengths)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+
+    position = (np.arange(len(values)) - starts[ids]).astype(np.uint64)
+    elements = __mix(values.astype(np.uint64) + (position << np.uint64(32)))
+
+    hashes = np.zeros(len(lengths), dtype=np.uint64)
+    nonempty = lengths > 0
+    if len(values) > 0:
+        hashes[nonempty] = np.add.reduceat(elements, starts[nonempty])
+    return __mix(hashes ^ lengths.astype(np.uint64))
+
+
+def __iter_text(file: BinaryIO) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    yield from output.iter_arrays(file, __CHUNK_BYTES)
+
+
+def __iter_binary(archive: zipfile.ZipFile) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # Both arrays are read a chunk at a time, without loading the archive.
+    with archive.open('indptr.npy') as indptr_file, archive.open('rows.npy') as rows_file:
+        read_indptr = __npy_reader(indptr_file)
+        read_rows = __npy_reader(rows_file)
+
+        last = read_indptr(1)
+        while len(last) > 0:
+            ends = read_indptr(__CHUNK_COVERAGES)
+            if len(ends) == 0:
+                return
+
+            values = read_rows(int(ends[-1] - last[0]))
+            yield values.astype(np.int64) + 1, np.diff(ends, prepend=last[0])
+            last = ends[-1:]
+
+
+def __npy_reader(file: BinaryIO) -> Callable[[int], np.ndarray]:
+    # Reads the header of a .npy file, and returns a function reading its next elements.
+    version = np.lib.format.read_magic(file)
+    if version == (1, 0):
+        _, _, dtype = np.lib.format.read_array_header_1_0(file)
+    else:
+        _, _, dtype = np.lib.format.read_array_header_2_0(file)
+
+    def read(count: int) -> np.ndarray:
+        return np.frombuffer(file.read(count * dtype.itemsize), dtype=dtype)
+
+    return read
+
+
+def __canonical(values: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Sorts the rows of every coverage, and returns the coverage of every row.
+    # The rows are below 2^32, so a single sort of (coverage, row) keys is enough.
+    ids = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    keys = np.sort((ids << 32) | values.astype(np.int64))
+    return ids, keys & 0xffffffff
+
+
+def __mix(hashes: np.ndarray) -> np.ndarray:
+    # The finalizer of splitmix64, the products wrap modulo 2^64.
+    hashes = hashes.astype(np.uint64)
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def __search_name(result: ec.Result) -> str:
+    # The options of the search that change the visited nodes.
+    # EC and EC plus visit the same nodes, as the serial and the parallel search.
+    return f'{result.engine}, order {result.order or "input"}, ' \
+        f'pruned {result.pruned_nodes > 0}, reduced {result.reduction is not None}, ' \
+        f'decomposed {result.components is not None}'
+
+
+def __count_diff(first: Fingerprint, other: Fingerprint) -> Difference:
+    return Difference(file_name=other.file_name,
+                      missing_count=max(first.coverage_count - other.coverage_count, 0),
+                      extra_count=max(other.coverage_count - first.coverage_count, 0),
+                      count_only=True)
+
+
+def __diff(first_file: str,
+           other_file: str,
+           first_hashes: np.ndarray,
+           other_hashes: np.ndarray,
+           max_diffs: int) -> Difference:
+    # The multisets of hashes are compared, then the coverages with the
+    # differing hashes are looked up in the files.
+    first_unique, first_counts = np.unique(first_hashes, return_counts=True)
+    other_unique, other_counts = np.unique(other_hashes, return_counts=True)
+
+    all_hashes = np.union1d(first_unique, other_unique)
+    first_all = np.zeros(len(all_hashes), dtype=np.int64)
+    other_all = np.zeros(len(all_hashes), dtype=np.int64)
+    first_all[np.searchsorted(all_hashes, first_unique)] = first_counts
+    other_all[np.searchsorted(all_hashes, other_unique)] = other_counts
+
+    missing = all_hashes[first_all > other_all]
+    extra = all_hashes[other_all > first_all]
+
+    return Difference(file_name=other_file,
+                      missing=__find_coverages(first_file, missing[:max_diffs]),
+                      extra=__find_coverages(other_file, extra[:max_diffs]),
+                      missing_count=int(np.maximum(first_all - other_all, 0).sum()),
+                      extra_count=int(np.maximum(other_all - first_all, 0).sum()))
+
+
+def __find_coverages(file_name: str, hashes: np.ndarray) -> List[Tuple[int, ...]]:
+    found = {}
+    if len(hashes) == 0:
+        return []
+
+    for values, lengths in iter_coverages(file_name):
+        coverage_hashes = hash_coverages(values, lengths)
+        matches = np.flatnonzero(np.isin(coverage_hashes, hashes))
+        if len(matches) == 0:
+            continue
+
+        _, canonical = __canonical(values, lengths)
+        coverages = output.split_arrays(canonical, lengths)
+        for idx in matches:
+            found.setdefault(int(coverage_hashes[idx]), tuple(coverages[idx].tolist()))
 
-    results = []
-    all_equal = True
-    min_exec_time = 0.0
-    min_idx = 0
+        if len(found) == len(hashes):
+            break
 
-    for idx, file_name in enumerate(input_files):
-        res = ec.read_result(file_name)
-        if res.execution_time < min_exec_time or min_exec_time == 0:
-            min_exec_time = res.execution_time
-            min_idx = idx
+    return [found[int(h)] for h in hashes if int(h) in found]
 
-        if len(results) > 0 and not res == results[0]:
-            all_equal = False
 
-        results.append(res)
+def __map(function, items: list, workers: int) -> list:
+    if workers <= 1 or len(items) <= 1:
+        return list(map(function, items))
 
-    return all_equal, min_exec_time, min_idx
+    with Pool(min(workers, len(items))) as pool:
+        return pool.map(function, items)
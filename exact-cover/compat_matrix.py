@@ -0,0 +1,145 @@
+"""compat_matrix.py
+Representation for the compatibility matrix B of the EC algorithm.
+"""
+
+from typing import List, Optional, Tuple
+import numpy as np
+from input_matrix import InputMatrix
+
+
+class CompatMatrix:
+    """Represents the compatibility matrix B.
+
+    EC only uses the upper triangle of B, ie B[j, i] with j < i,
+    so every column i is packed into a python int of (at most) i bits,
+    where the j-th bit is set if A[j] and A[i] are compatible.
+    This takes n^2 / 2 bits instead of the n^2 integers of a dense matrix,
+    and the intersection of two columns is a single AND between two ints.
+    """
+
+    shape: Tuple[int, int]
+
+    def __init__(self, n: int) -> None:
+        self.shape = (n, n)
+        self._columns = [0] * n
+
+    def set_compatible(self, j: int, i: int) -> None:
+        """Marks A[j] and A[i] as compatible, ie sets B[j, i] to 1.
+
+        Args:
+            j (int): The index of the row, must be less than i.
+            i (int): The index of the column.
+        """
+        self._columns[i] |= 1 << j
+
+    def is_compatible(self, j: int, i: int) -> bool:
+        """Check if A[j] and A[i] are compatible, ie if B[j, i] is 1.
+
+        Args:
+            j (int): The index of the row, must be less than i.
+            i (int): The index of the column.
+
+        Returns:
+            bool: True if the rows are compatible, False otherwise.
+        """
+        return (self._columns[i] >> j) & 1 == 1
+
+    def column(self, i: int, rows: Optional[int] = None) -> int:
+        """Returns the column B[0:rows, i] as a bitset.
+
+        Args:
+            i (int): The index of the column.
+            rows (int, optional): The number of rows to keep. Defaults to all of them.
+
+        Returns:
+            int: The column, where the j-th bit is B[j, i].
+        """
+        if rows is None:
+            return self._columns[i]
+
+        return self._columns[i] & ((1 << rows) - 1)
+
+    def set_column(self, i: int, column: int) -> None:
+        """Sets the whole column B[0:i, i].
+
+        Args:
+            i (int): The index of the column.
+            column (int): The column, where the j-th bit is B[j, i].
+        """
+        self._columns[i] = column
+
+    def buffer_shape(self) -> Tuple[int, int]:
+        """Returns the shape of the uint8 buffer needed by to_buffer."""
+        return self.shape[0], (self.shape[0] + 7) // 8
+
+    def to_buffer(self, buffer: np.ndarray) -> None:
+        """Writes B to a buffer (eg shared memory), one packed column per row.
+
+        Args:
+            buffer (np.ndarray): uint8 array with the shape given by buffer_shape.
+        """
+        width = buffer.shape[1]
+        for i, column in enumerate(self._columns):
+            buffer[i] = np.frombuffer(column.to_bytes(width, 'little'), dtype=np.uint8)
+
+    @staticmethod
+    def from_buffer(buffer: np.ndarray) -> 'CompatMatrix':
+        """Reads B from a buffer written by to_buffer.
+
+        Args:
+            buffer (np.ndarray): uint8 array with one packed column per row.
+
+        Returns:
+            CompatMatrix: The compatibility matrix.
+        """
+        compat_matrix = CompatMatrix(buffer.shape[0])
+        for i, column in enumerate(buffer):
+            compat_matrix.set_column(i, int.from_bytes(column.tobytes(), 'little'))
+
+        return compat_matrix
+
+    @staticmethod
+    def precompute(input_matrix: InputMatrix) -> Tuple['CompatMatrix', List[int]]:
+        """Builds the whole B at once, instead of one pair (i, j) at a time.
+
+        Two rows are disjoint if their entry in the sparse product A * A^T is zero,
+        and two disjoint rows are a coverage if their cardinalities add up to m.
+        Empty and full rows are skipped by EC, so their columns are left to 0.
+
+        Args:
+            input_matrix (InputMatrix): The input matrix A.
+
+        Returns:
+            CompatMatrix: The compatibility matrix.
+            List[int]: For every row i, the bitset of the rows j < i disjoint from it.
+        """
+        n, m = input_matrix.shape
+        card = np.asarray(input_matrix.nonzero_per_row())
+
+        rows = input_matrix.to_sparse().astype(np.int32)
+        overlaps = (rows @ rows.T).tocsr()
+        overlaps.eliminate_zeros()
+
+        compat_matrix = CompatMatrix(n)
+        disjoint_rows = [0] * n
+        for i in range(n):
+            if card[i] in (0, m):
+                continue
+
+            disjoint = np.ones(i, dtype=bool)
+            overlapping = overlaps.indices[overlaps.indptr[i]:overlaps.indptr[i + 1]]
+            disjoint[overlapping[overlapping < i]] = False
+            compatible = disjoint & (card[:i] != m - card[i])
+
+            disjoint_rows[i] = _to_bitset(disjoint)
+            compat_matrix.set_column(i, _to_bitset(compatible))
+
+        return compat_matrix, disjoint_rows
+
+    def __sizeof__(self) -> int:
+        return sum(map(lambda col: col.__sizeof__(), self._columns))
+
+
+def _to_bitset(array: np.ndarray) -> int:
+    # The k-th bit of the result is array[k].
+    return int.from_bytes(np.packbits(array, bitorder='little').tobytes(), 'little')
@@ -0,0 +1,169 @@
+"""components.py
+Decomposition of an instance into independent components, solved separately.
+"""
+
+import dataclasses
+import itertools
+import math
+import time
+from typing import Callable, Iterator, List
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from ec import Result
+from input_matrix import InputMatrix
+
+
+class Decomposition:  # pylint: disable=too-few-public-methods
+    """Splits an instance into the connected components of the graph
+    where every row is linked to the columns of its elements.
+
+    Two components share no columns, so the exact coverages of the instance
+    are all the combinations of one exact coverage of every component.
+    Empty rows are not in any component, as they are never part of a coverage.
+    """
+
+    def __init__(self, input_matrix: InputMatrix):
+        start_time = time.process_time()
+
+        rows = input_matrix.to_sparse().tocsr()
+        self.shape = rows.shape
+        n = self.shape[0]
+
+        graph = sparse.bmat([[None, rows], [rows.T, None]])
+        _, labels = csgraph.connected_components(graph, directed=False)
+        row_labels, col_labels = labels[:n], labels[n:]
+
+        # Original indexes of the rows of every component, and the component itself.
+        self.rows: List[np.ndarray] = []
+        self.components: List[InputMatrix] = []
+        for label in np.unique(col_labels):
+            component_rows = np.flatnonzero(row_labels == label)
+            component_cols = np.flatnonzero(col_labels == label)
+            self.rows.append(component_rows)
+            self.components.append(type(input_matrix)(
+                rows[component_rows][:, component_cols].toarray()))
+
+        self.execution_time = time.process_time() - start_time
+
+
+class Decomposed:  # pylint: disable=too-many-instance-attributes
+    """Runs an algorithm on every component of a decomposition,
+    returning the combined coverages of the whole instance.
+
+    The coverages of all the components but the biggest one are kept in memory,
+    while the ones of the biggest component are combined with them as they are found.
+    With count_only, the counts of the components are multiplied.
+    """
+
+    def __init__(self,
+                 decomposition: Decomposition,
+                 create_alg: Callable[[InputMatrix, bool], object],
+                 count_only: bool = False,
+                 max_coverages: int = -1):
+        self.__decomposition = decomposition
+        self.__count_only = count_only
+        self.__max_coverages = max_coverages
+
+        # The components from the smallest to the biggest,
+        # each one with its own algorithm (which lists the coverages
+        # unless counting is enough).
+        self.__order = sorted(range(len(decomposition.components)),
+                              key=lambda c: decomposition.components[c].shape[0])
+        self.__algs = [create_alg(decomposition.components[c], count_only)
+                       for c in self.__order]
+
+        # COV
+        self._coverages = []
+        self._coverage_count = 0
+
+        # Flag for stopping the algorithm.
+        self.__stop_flag = False
+
+    def stop(self):
+        """Stop the algorithm."""
+        self.__stop_flag = True
+        for alg in self.__algs:
+            alg.stop()
+
+    def start(self) -> Result:
+        """Start the algorithm."""
+        for coverage in self.iter_coverages():
+            self._coverages.append(coverage)
+
+        return self.result()
+
+    def iter_coverages(self) -> Iterator[np.ndarray]:
+        """Start the algorithm, yielding every coverage of the whole instance
+        as soon as the coverages of the components it is made of are found.
+
+        Yields:
+            np.ndarray: The indexes of the rows of an exact coverage.
+                        Nothing is yielded with count_only.
+        """
+        if self.__count_only:
+            self.__count()
+            return
+
+        # The coverages of the smaller components, mapped to the original rows.
+        found = []
+        for alg, c in zip(self.__algs[:-1], self.__order[:-1]):
+            rows = self.__decomposition.rows[c]
+            found.append([rows[coverage] for coverage in alg.iter_coverages()])
+            if not found[-1] or self.__stop_flag:
+                return
+
+        if self.__coverage_limit_reached():
+            return
+
+        rows = self.__decomposition.rows[self.__order[-1]]
+        for coverage in self.__algs[-1].iter_coverages():
+            for others in itertools.product(*found):
+                self._coverage_count += 1
+                # The last search is stopped as soon as the last coverage is found,
+                # and not when looking for the next one.
+                if self.__coverage_limit_reached():
+                    self.stop()
+                yield np.sort(np.concatenate((rows[coverage], *others)))[::-1]
+                if self.__coverage_limit_reached():
+                    return
+
+    def result(self) -> Result:
+        """Returns the result of the algorithm, with the coverages kept by start()."""
+        results = [alg.result() for alg in self.__algs]
+        components = [self.__decomposition.components[c].shape for c in self.__order]
+
+        return dataclasses.replace(
+            results[-1],
+            coverages=self._coverages,
+            visited_nodes=sum(result.visited_nodes for result in results),
+            pruned_nodes=sum(result.pruned_nodes for result in results),
+            total_nodes=(2**self.__decomposition.shape[0])-1,
+            # The algorithms are created together, so each one measures
+            # the time from the start of the search.
+            execution_time=self.__decomposition.execution_time
+            + max(result.execution_time for result in results),
+            stopped=self.__stop_flag and not self.__coverage_limit_reached(),
+            time_limit_reached=any(result.time_limit_reached for result in results),
+            coverage_count=self._coverage_count,
+            coverage_limit_reached=self.__coverage_limit_reached(),
+            count_only=self.__count_only,
+            components=components,
+            stop_reason='coverages' if self.__coverage_limit_reached()
+            else next((result.stop_reason for result in results
+                       if result.stop_reason is not None), None))
+
+    def __count(self):
+        counts = []
+        for alg in self.__algs:
+            alg.start()
+            counts.append(alg.result().coverage_count)
+            if counts[-1] == 0 or self.__stop_flag:
+                break
+
+        self._coverage_count = math.prod(counts) if len(counts) == len(self.__algs) else 0
+        if self.__max_coverages >= 0:
+            self._coverage_count = min(self._coverage_count, self.__max_coverages)
+
+    def __coverage_limit_reached(self) -> bool:
+        return 0 <= self.__max_coverages <= self._coverage_count
@@ -0,0 +1,268 @@
+"""dlx.py
+Implementation of Knuth's Algorithm X with Dancing Links (DLX),
+as an alternative engine to EC for highly constrained instances.
+"""
+
+import time
+from typing import Iterator
+import numpy as np
+from ec import Result
+from input_matrix import InputMatrix
+
+
+class DLX:  # pylint: disable=too-many-instance-attributes
+    """The DLX algorithm.
+
+    The input matrix is stored as a toroidal doubly linked list,
+    with one node for every one in the matrix and one header for every column.
+    At each step the column with the fewest remaining rows is covered
+    (minimum remaining values), so the search only branches on the rows
+    that can actually cover it.
+
+    With count_only the coverages are only counted, without building them,
+    and with max_coverages the search stops as soon as that many coverages are found.
+    """
+
+    def __init__(self,
+                 input_matrix: InputMatrix,
+                 time_limit: float = -1,
+                 count_only: bool = False,
+                 max_coverages: int = -1):
+        # Check if the input matrix is valid
+        if not input_matrix.is_valid():
+            raise ValueError("Input matrix is not valid")
+
+        self._n, self._m = input_matrix.shape
+
+        # Node 0 is the root, nodes 1..m are the column headers
+        # and the remaining ones are the ones of the matrix.
+        # The links are kept in plain lists, as indexing them is much faster
+        # than allocating an object for every node.
+        headers = range(self._m + 1)
+        self.__left = [i - 1 for i in headers]
+        self.__right = [i + 1 for i in headers]
+        self.__left[0] = self._m
+        self.__right[self._m] = 0
+        self.__up = list(headers)
+        self.__down = list(headers)
+        self.__col = list(headers)
+        self.__row = [-1] * (self._m + 1)
+        self.__size = [0] * (self._m + 1)
+
+        for i in range(self._n):
+            self.__add_row(i, input_matrix.row_nonzero(i))
+
+        # COV
+        self._coverages = []
+
+        self.__count_only = count_only
+        self.__time_limit = time_limit
+        self.__max_coverages = max_coverages
+        self.__start_time = time.process_time()
+
+        # Flag for stopping the algorithm, and the reason why the search stopped,
+        # set when it stops so that result() does not depend on when it is called.
+        self.__stop_flag = False
+        self.__stop_reason = None
+
+        # Node statistics.
+        self._visited_nodes = 0
+        self._coverage_count = 0
+
+    def stop(self):
+        """Stop the algorithm."""
+        self.__stop_flag = True
+
+    def start(self) -> Result:
+        """Start the algorithm."""
+        for coverage in self.iter_coverages():
+            self._coverages.append(coverage)
+
+        # Sort the coverages in the order in which EC would find them.
+        self._coverages.sort(key=tuple)
+
+        return self.result()
+
+    def iter_coverages(self) -> Iterator[np.ndarray]:
+        """Start the algorithm, yielding every coverage as soon as it is found.
+        The coverages are not kept by the algorithm:
+        when the iteration is over, result() returns the statistics of the search.
+
+        Yields:
+            np.ndarray: The indexes of the rows of an exact coverage.
+                        Nothing is yielded with count_only.
+        """
+        right, down, col, row = self.__right, self.__down, self.__col, self.__row
+
+        # Row nodes chosen so far, one per level of the tree.
+        solution = []
+
+        node = self.__choose_column()
+        while node is not None:
+            if self.__should_stop():
+                break
+
+            column = col[node]
+
+            # All the rows of this column have been tried, go back up.
+            if node == column:
+                self.__uncover(column)
+                if not solution:
+                    break
+
+                node = solution.pop()
+                self.__uncover_row(node)
+                node = down[node]
+                continue
+
+            self._visited_nodes += 1
+
+            # Try to add the row of the node to the coverage.
+            solution.append(node)
+            other = right[node]
+            while other != node:
+                self.__cover(col[other])
+                other = right[other]
+
+            if right[0] == 0:
+                # Every column is covered: return the coverage with the indexes
+                # in the same (decreasing) order used by EC.
+                self._coverage_count += 1
+                if not self.__count_only:
+                    yield np.array(sorted((row[n] for n in solution), reverse=True))
+            else:
+                next_node = self.__choose_column()
+                if next_node is not None:
+                    node = next_node
+                    continue
+
+            # Dead end or coverage found: try the next row of the column.
+            solution.pop()
+            self.__uncover_row(node)
+            node = down[node]
+
+    def result(self) -> Result:
+        """Returns the result of the algorithm, with the coverages kept by start()."""
+        return Result(coverages=self._coverages,
+                      visited_nodes=self._visited_nodes,
+                      total_nodes=(2**self._n)-1,
+                      execution_time=self.__execution_time(),
+                      stopped=self.__stop_flag,
+                      time_limit_reached=self.__stop_reason == 'time',
+                      engine='DLX',
+                      coverage_count=self._coverage_count,
+                      coverage_limit_reached=self.__coverage_limit_reached(),
+                      count_only=self.__count_only,
+                      stop_reason=self.__stop_reason)
+
+    def __add_row(self, i: int, cols: np.ndarray):
+        first = None
+        for c in cols:
+            header = int(c) + 1
+            node = len(self.__col)
+
+            # Append the node at the bottom of the column.
+            self.__col.append(header)
+            self.__row.append(i)
+            self.__up.append(self.__up[header])
+            self.__down.append(header)
+            self.__down[self.__up[header]] = node
+            self.__up[header] = node
+            self.__size[header] += 1
+
+            # Append the node at the end of the row.
+            if first is None:
+                first = node
+                self.__left.append(node)
+                self.__right.append(node)
+            else:
+                self.__left.append(self.__left[first])
+                self.__right.append(first)
+                self.__right[self.__left[first]] = node
+                self.__left[first] = node
+
+    def __choose_column(self):
+        # Covers the column with the fewest rows and returns its first row,
+        # or None if the column cannot be covered by any row.
+        right, size = self.__right, self.__size
+
+        best = right[0]
+        header = right[best]
+        while header != 0 and size[best] > 1:
+            if size[header] < size[best]:
+                best = header
+            header = right[header]
+
+        if size[best] == 0:
+            return None
+
+        self.__cover(best)
+        return self.__down[best]
+
+    def __cover(self, column: int):
+        left, right, up, down, col, size = self.__left, self.__right, \
+            self.__up, self.__down, self.__col, self.__size
+
+        right[left[column]] = right[column]
+        left[right[column]] = left[column]
+
+        node = down[column]
+        while node != column:
+            other = right[node]
+            while other != node:
+                down[up[other]] = down[other]
+                up[down[other]] = up[other]
+                size[col[other]] -= 1
+                other = right[other]
+            node = down[node]
+
+    def __uncover(self, column: int):
+        left, right, up, down, col, size = self.__left, self.__right, \
+            self.__up, self.__down, self.__col, self.__size
+
+        node = up[column]
+        while node != column:
+            other = left[node]
+            while other != node:
+                size[col[other]] += 1
+                down[up[other]] = other
+                up[down[other]] = other
+                other = left[other]
+            node = up[node]
+
+        right[left[column]] = column
+        left[right[column]] = column
+
+    def __uncover_row(self, node: int):
+        # Undoes the covers done when the row of the node was chosen,
+        # in reverse order.
+        other = self.__left[node]
+        while other != node:
+            self.__uncover(self.__col[other])
+            other = self.__left[other]
+
+    def __execution_time(self) -> float:
+        return time.process_time() - self.__start_time
+
+    def __time_limit_reached(self) -> bool:
+        if self.__time_limit < 0:
+            return False
+
+        return self.__execution_time() > self.__time_limit
+
+    def __coverage_limit_reached(self) -> bool:
+        return 0 <= self.__max_coverages <= self._coverage_count
+
+    def __should_stop(self) -> bool:
+        # Once a budget is over, the search stops for good.
+        if self.__stop_reason is not None:
+            return True
+
+        if self.__stop_flag:
+            self.__stop_reason = 'stopped'
+        elif self.__coverage_limit_reached():
+            self.__stop_reason = 'coverages'
+        elif self.__time_limit_reached():
+            self.__stop_reason = 'time'
+
+        return self.__stop_reason is not None
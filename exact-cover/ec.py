@@ -6,11 +6,29 @@ along with the functions to read and write the input and output files.
 from collections import deque
 from datetime import datetime
 from dataclasses import dataclass
+import io
+import json
+import math
+import os
+import re
+import shutil
+import sys
 import time
-from typing import Iterable, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
 import numpy as np
+from scipy import sparse
 from inst import sudoku
-from input_matrix import InputMatrix, DenseInputMatrix, SparseInputMatrix
+import binary
+from checkpoint import Checkpoint, fingerprint, read_checkpoint, write_checkpoint
+from compat_matrix import CompatMatrix
+from input_matrix import InputMatrix, DenseInputMatrix, SparseInputMatrix, BitsetInputMatrix
+from observer import SearchObserver
+import output
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
 
 
 @dataclass
@@ -24,6 +42,16 @@ class Result:
     stopped: bool
     time_limit_reached: bool
     plus: bool = False
+    engine: str = 'EC'
+    coverage_count: int = 0
+    coverage_limit_reached: bool = False
+    count_only: bool = False
+    reduction: Optional[dict] = None
+    components: Optional[list] = None
+    pruned_nodes: int = 0
+    order: Optional[str] = None
+    stats: Optional[dict] = None
+    stop_reason: Optional[str] = None
 
     def __eq__(self, __o: 'Result') -> bool:
         return self.coverages == __o.coverages \
@@ -36,9 +64,45 @@ class Result:
 
 
 class EC:  # pylint: disable=too-many-instance-attributes
-    """The basic EC algorithm."""
+    """The basic EC algorithm.
+
+    With count_only the coverages are only counted, without building them,
+    and with max_coverages the search stops as soon as that many coverages are found.
+    With prune, a subtree is cut as soon as some column not covered yet
+    cannot be covered by any of the compatible rows left.
+    With precompute, B is built at once from the sparse product A * A^T
+    before the search, instead of checking every pair of rows,
+    and the rows of a set are then known to be disjoint: the size of their union
+    is the sum of their cardinalities, so the search only looks them up, as EC plus.
+    With checkpoint_file the state of the search is saved every checkpoint_interval
+    seconds and when it stops, so that it can be continued with load_checkpoint.
+    The tree is then always explored without recursion, as the stack must be saved.
+    With observer, the events of the search are sent to it
+    and its summary is returned in the result.
+
+    The search stops when one of its budgets is over: time_limit seconds,
+    max_nodes nodes visited, max_memory MB of peak memory or max_coverages coverages.
+    After load_checkpoint, the time and the nodes are counted from the start of the new run.
+    The time and the memory are read only every check_interval checks,
+    and the budget that stopped the search is the stop_reason of the result.
+    """
 
-    def __init__(self, input_matrix: InputMatrix, time_limit: float = -1, use_stack: bool = False):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 input_matrix: InputMatrix,
+                 time_limit: float = -1,
+                 use_stack: bool = False,
+                 use_iterative: bool = False,
+                 compat_matrix: Optional[CompatMatrix] = None,
+                 count_only: bool = False,
+                 max_coverages: int = -1,
+                 checkpoint_file: Optional[str] = None,
+                 checkpoint_interval: float = 60,
+                 precompute: bool = False,
+                 prune: bool = False,
+                 observer: Optional[SearchObserver] = None,
+                 max_nodes: int = -1,
+                 max_memory: float = -1,
+                 check_interval: int = 1024):
         # Check if the input matrix is valid
         if not input_matrix.is_valid():
             raise ValueError("Input matrix is not valid")
@@ -47,15 +111,45 @@ class EC:  # pylint: disable=too-many-instance-attributes
         self._input_matrix = input_matrix
         self._n, self._m = input_matrix.shape
         self.__use_stack = use_stack
-
-        # B
-        self._compat_matrix = np.zeros((self._n, self._n), dtype=int)
+        self.__use_iterative = use_iterative
+        self.__count_only = count_only
+        self.__precompute = precompute
+        self.__disjoint_rows = None
+        self.__precomputed_card = None
+        self.__prune = prune
+        self.__observer = observer
+
+        # The rows of A as bitsets of columns, used by the pruning.
+        self.__full_mask = (1 << self._m) - 1
+        self.__row_masks = []
+        if prune:
+            self.__row_masks = [int.from_bytes(np.packbits(row != 0, bitorder='little')
+                                               .tobytes(), 'little')
+                                for row in input_matrix]
+
+        # Buffers of the explicit stack used by __esplora_iter,
+        # one slot per level of the tree (a coverage has at most n rows).
+        # They are allocated once and reused by every exploration.
+        self.__indexes_buf = np.empty(self._n, dtype=int)
+        self.__unions_buf = [None] * self._n
+        self.__inters_buf = [0] * self._n
+        self.__positions_buf = [0] * self._n
+
+        # B, which can also be given already built (eg by ParallelEC).
+        self._compat_matrix = CompatMatrix(
+            self._n) if compat_matrix is None else compat_matrix
 
         # COV
         # List instead of numpy array because it is more efficient to append.
         self._coverages = []
 
         self.__time_limit = time_limit
+        self.__max_coverages = max_coverages
+        self.__max_nodes = max_nodes
+        self.__max_memory = max_memory
+        self.__check_interval = check_interval
+        self.__check_countdown = check_interval
+        self.__stop_reason = None
 
         # process_time() is used instead of time() because it is more precise,
         # as it measures the time spent by the process in the CPU.
@@ -66,6 +160,23 @@ class EC:  # pylint: disable=too-many-instance-attributes
 
         # Node statistics.
         self._visited_nodes = 0
+        self._pruned_nodes = 0
+        self._coverage_count = 0
+        # The nodes visited before this run, eg restored from a checkpoint:
+        # max_nodes counts from here, as the time limit counts from the start of the run.
+        self.__start_nodes = 0
+
+        # State of the search, saved in the checkpoints.
+        # position is the next pair (i, j) of the outer loops,
+        # with j None if row i has not been visited yet.
+        self.__checkpoint_file = checkpoint_file
+        self.__checkpoint_interval = checkpoint_interval
+        self.__next_checkpoint = time.monotonic() + checkpoint_interval
+        self.__position = (0, None)
+        self.__frontier_left = []
+        self.__found = []
+        self.__previous_time = 0.0
+        self.__fingerprint = None
 
     def stop(self):
         """Stop the algorithm."""
@@ -73,104 +184,440 @@ class EC:  # pylint: disable=too-many-instance-attributes
 
     def start(self) -> Result:
         """Start the algorithm."""
-        for i in range(self._n):
+        for coverage in self.iter_coverages():
+            self._coverages.append(coverage)
+
+        return self.result()
+
+    def load_checkpoint(self, checkpoint_file: str):
+        """Restores the state of a stopped search, so that start() continues it.
+        The coverages found before the checkpoint are returned again.
+
+        Args:
+            checkpoint_file (str): The path of a checkpoint written by the algorithm.
+        """
+        checkpoint = read_checkpoint(checkpoint_file)
+        if checkpoint.fingerprint != self.__get_fingerprint() \
+                or checkpoint.plus != isinstance(self, ECPlus) \
+                or checkpoint.count_only != self.__count_only \
+                or checkpoint.precompute != self.__precompute \
+                or checkpoint.prune != self.__prune:
+            raise ValueError("Checkpoint does not match the input and the algorithm")
+
+        for i, column in enumerate(checkpoint.columns):
+            self._compat_matrix.set_column(i, column)
+
+        self.__position = (checkpoint.i, checkpoint.j)
+        self.__frontier_left = checkpoint.frontier
+        self.__found = checkpoint.coverages
+        self._visited_nodes = checkpoint.visited_nodes
+        self._pruned_nodes = checkpoint.pruned_nodes
+        self._coverage_count = checkpoint.coverage_count
+        self.__previous_time = checkpoint.execution_time
+
+    def iter_coverages(self) -> Iterator[np.ndarray]:
+        """Start the algorithm, yielding every coverage as soon as it is found.
+        The coverages are not kept by the algorithm:
+        when the iteration is over, result() returns the statistics of the search.
+
+        Yields:
+            np.ndarray: The indexes of the rows of an exact coverage.
+                        Nothing is yielded with count_only.
+        """
+        self.__start_nodes = self._visited_nodes
+        if self.__checkpoint_file is None:
+            yield from self.__search()
+            return
+
+        # The coverages are kept to be saved in the checkpoints.
+        yield from self.__found
+        for coverage in self.__search():
+            self.__found.append(coverage)
+            yield coverage
+
+        if self.__should_stop():
+            self.__save_checkpoint(self.__frontier_left)
+        elif os.path.exists(self.__checkpoint_file):
+            # The search is over, so the checkpoint is no longer needed.
+            os.remove(self.__checkpoint_file)
+
+    def __search(self) -> Iterator[np.ndarray]:
+        # The union values of the subtrees left by a checkpoint
+        # are cardinalities with precompute, so it comes first.
+        if self.__precompute:
+            self._compat_matrix, self.__disjoint_rows = \
+                CompatMatrix.precompute(self._input_matrix)
+            self.__precomputed_card = np.asarray(self._input_matrix.nonzero_per_row()).tolist()
+
+        # The subtrees left by a checkpoint come before the next pair (i, j),
+        # the deepest ones first as in the recursion.
+        while self.__frontier_left:
+            indexes, inter, union_value, first = self.__frontier_left.pop()
+            yield from self.__esplora_iter(indexes, union_value, inter, first)
+            if self.__should_stop():
+                return
+
+        first_i, first_j = self.__position
+        for i in range(first_i, self._n):
             if self.__should_stop():
                 break
 
+            # The row was already visited before the checkpoint.
+            if i == first_i and first_j is not None:
+                yield from self.__search_pairs(i, first_j)
+                continue
+
+            self.__position = (i, None)
+            self.__save_checkpoint_if_due()
             self._visited_nodes += 1
+            if self.__observer is not None:
+                self.__observer.on_node(1)
 
             # If A[i] is empty, skip it.
             if self._input_matrix.row_empty(i):
+                self.__position = (i + 1, None)
                 continue
 
             # If A[i] is equal to M, add it to the coverages.
             if self._input_matrix.row_full(i):
-                self._coverages.append([i])
+                self.__position = (i + 1, None)
+                self._coverage_count += 1
+                if self.__observer is not None:
+                    self.__observer.on_coverage(1)
+                if not self.__count_only:
+                    yield np.array([i])
                 continue
 
-            # Iterate rows before A[i].
-            for j in range(i):
-                if self.__should_stop():
-                    break
+            self.__position = (i, 0)
+            yield from self.__search_pairs(i, 0)
+
+    def __search_pairs(self, i: int, first: int) -> Iterator[np.ndarray]:
+        # Iterate rows before A[i], from first.
+        # With precompute only the rows disjoint from A[i] are tried,
+        # the set bits of its column, while the others are just counted as visited.
+        observer = self.__observer
+        if self.__disjoint_rows is None:
+            candidates = range(first, i)
+        else:
+            candidates = _set_bits(self.__disjoint_rows[i] >> first << first)
+
+        skipped = first
+        for j in candidates:
+            if self.__should_stop():
+                return
+
+            self._visited_nodes += j - skipped
+            if observer is not None:
+                observer.on_node(2, j - skipped + 1)
+            skipped = j + 1
 
-                self._visited_nodes += 1
+            self.__position = (i, j)
+            self.__save_checkpoint_if_due()
+            self._visited_nodes += 1
+            self.__position = (i, j + 1)
 
-                # If the rows have at least one element in common,
-                # set the compatibility to 0.
+            # If the rows have at least one element in common,
+            # the compatibility is left to 0.
+            if self.__disjoint_rows is None:
                 _, nnz_inter = self._input_matrix.rows_intersection(i, j)
-                if nnz_inter > 0:
-                    self._compat_matrix[j, i] = 0
-                else:
-                    indexes = deque(
-                        [i, j]) if self.__use_stack else np.array([i, j])
-                    union_value, is_cov = self._get_union_value(i, j)
-
-                    # If the union of the two rows is equal to M,
-                    # add the indexes to the coverages and set the compatibility to 0.
-                    if is_cov:
-                        self._coverages.append(np.array(indexes))
-                        self._compat_matrix[j, i] = 0
+                if nnz_inter != 0:
+                    continue
+
+            indexes = deque(
+                [i, j]) if self.__use_stack else np.array([i, j])
+            union_value, is_cov = self._get_union_value(i, j)
+
+            # If the union of the two rows is equal to M,
+            # add the indexes to the coverages and leave the compatibility to 0.
+            if is_cov:
+                self._coverage_count += 1
+                if observer is not None:
+                    observer.on_coverage(2)
+                if not self.__count_only:
+                    yield np.array(indexes)
+            else:
+                self._compat_matrix.set_compatible(j, i)
+
+                # Sets compatible with A[i] and A[j].
+                inter = self._compat_matrix.column(i, j) \
+                    & self._compat_matrix.column(j)
+
+                # If there are compatible sets that can complete the coverage, explore them.
+                if inter != 0 and self.__feasible(indexes, inter):
+                    if observer is not None:
+                        observer.on_branch(2, bin(inter).count('1'))
+                    if self.__use_iterative or self.__checkpoint_file is not None:
+                        yield from self.__esplora_iter(indexes, union_value, inter)
                     else:
-                        self._compat_matrix[j, i] = 1
+                        yield from self.__esplora(indexes, union_value, inter)
 
-                        # Sets compatible with A[i] and A[j].
-                        inter = np.bitwise_and(
-                            self._compat_matrix[0:j, i], self._compat_matrix[0:j, j])
-
-                        # If there are compatible sets, explore them.
-                        if np.any(inter != 0):
-                            self.__esplora(indexes, union_value, inter)
+        self._visited_nodes += i - skipped
+        if observer is not None and i > skipped:
+            observer.on_node(2, i - skipped)
+        self.__position = (i, i)
 
+    def result(self) -> Result:
+        """Returns the result of the algorithm, with the coverages kept by start()."""
         return Result(coverages=self._coverages,
                       visited_nodes=self._visited_nodes,
                       total_nodes=(2**self._n)-1,
-                      execution_time=self.__execution_time(),
+                      execution_time=self.__previous_time + self.__execution_time(),
                       stopped=self.__stop_flag,
-                      time_limit_reached=self.__time_limit_reached()
-                      )
+                      time_limit_reached=self.__stop_reason == 'time',
+                      coverage_count=self._coverage_count,
+                      coverage_limit_reached=self.__coverage_limit_reached(),
+                      count_only=self.__count_only,
+                      pruned_nodes=self._pruned_nodes,
+                      stats=self.__observer.summary() if self.__observer is not None else None,
+                      stop_reason=self.__stop_reason)
+
+    def explore(self,  # pylint: disable=too-many-arguments
+                indexes: list,
+                inter: int,
+                union_value=None,
+                first: int = 0,
+                max_nodes: int = -1) -> Tuple[list, int, int, list]:
+        """Explores only the subtree of a partial coverage, with B already built.
+        The coverages and the visited nodes of the algorithm are left unchanged.
+
+        Args:
+            indexes (list): The indexes of the rows in the partial coverage (at least two).
+            inter (int): The bitset of the rows compatible with all the rows in indexes.
+            union_value (optional): The union value of the rows in indexes.
+                                    Computed from indexes if not given.
+            first (int, optional): The first row of inter to try. The rows before it
+                                   are still used deeper in the tree. Defaults to 0.
+            max_nodes (int, optional): Maximum number of nodes to visit,
+                                       negative for no limit. Defaults to -1.
+
+        Returns:
+            list: The coverages found in the subtree (empty with count_only).
+            int: The number of coverages found in the subtree.
+            int: The number of nodes visited.
+            list: The subtrees left unexplored when max_nodes is reached,
+                  as (indexes, inter, union_value, first) tuples.
+                  Empty if the subtree was completed.
+        """
+        if union_value is None:
+            union_value, _ = self._get_union_value(indexes[0], indexes[1])
+            for k in indexes[2:]:
+                union_value, _ = self._get_union_value_temp(union_value, k)
+
+        visited_nodes, self._visited_nodes = self._visited_nodes, 0
+        coverage_count, self._coverage_count = self._coverage_count, 0
+
+        frontier = []
+        coverages = list(self.__esplora_iter(
+            indexes, union_value, inter, first, max_nodes, frontier))
+
+        visited_nodes, self._visited_nodes = self._visited_nodes, visited_nodes
+        coverage_count, self._coverage_count = self._coverage_count, coverage_count
+
+        return coverages, coverage_count, visited_nodes, frontier
 
     def _get_union_value(self, i, j):
+        if self.__precomputed_card is not None:
+            union_value = self.__precomputed_card[i] + self.__precomputed_card[j]
+            return union_value, union_value == self._m
+
         union, nnz_union = self._input_matrix.rows_union(i, j)
         return union, nnz_union == self._m
 
     def _get_union_value_temp(self, union_value, k):
+        if self.__precomputed_card is not None:
+            union_value_temp = union_value + self.__precomputed_card[k]
+            return union_value_temp, union_value_temp == self._m
+
         union_tem, nnz_union_tem = self._input_matrix.union(k, union_value)
         return union_tem, nnz_union_tem == self._m
 
     def __esplora(self, indexes, union_value, inter):
-        for k, _ in enumerate(inter):
+        # inter is a bitset, where the k-th bit is set
+        # if A[k] is compatible with all the rows in indexes.
+        # Only the set bits are visited, from the lowest one.
+        observer = self.__observer
+        depth = len(indexes) + 1
+        candidates = inter
+        while candidates:
             if self.__should_stop():
                 break
 
-            # NB: I cannot remove zero elements from inter
-            # because I would lose information about the indexes.
-            if inter[k] == 1:
-                self._visited_nodes += 1
+            low = candidates & -candidates
+            k = low.bit_length() - 1
+            candidates ^= low
 
-                # Try to add A[k] to the coverage.
-                indexes_temp = None
+            self._visited_nodes += 1
+            if observer is not None:
+                observer.on_node(depth)
+
+            # Try to add A[k] to the coverage.
+            indexes_temp = None
+            if self.__use_stack:
+                indexes.append(k)
+                indexes_temp = indexes
+            else:
+                indexes_temp = np.append(indexes, k)
+
+            union_value_temp, is_cov = self._get_union_value_temp(
+                union_value, k)
+
+            if is_cov:
+                self._coverage_count += 1
+                if observer is not None:
+                    observer.on_coverage(depth)
+                if not self.__count_only:
+                    yield np.array(indexes_temp)
                 if self.__use_stack:
-                    indexes.append(k)
-                    indexes_temp = indexes
-                else:
-                    indexes_temp = np.append(indexes, k)
+                    indexes_temp.pop()
+            else:
+                # Column k only has bits below k, so this is inter[0:k] & B[0:k, k].
+                inter_temp = inter & self._compat_matrix.column(k)
+                if inter_temp != 0 and self.__feasible(indexes_temp, inter_temp):
+                    if observer is not None:
+                        observer.on_branch(depth, bin(inter_temp).count('1'))
+                    yield from self.__esplora(
+                        indexes_temp, union_value_temp, inter_temp)
 
-                union_value_temp, is_cov = self._get_union_value_temp(
-                    union_value, k)
+                if self.__use_stack:
+                    indexes_temp.pop()
+
+    def __esplora_iter(self,  # pylint: disable=too-many-arguments
+                       indexes, union_value, inter, first=0, max_nodes=-1, frontier=None):
+        # Same visit as __esplora, but without recursion:
+        # level l of the stack holds the union of indexes[0:l],
+        # the rows still compatible with them and the next row to try.
+        # When max_nodes is reached, the unexplored subtrees are added to frontier.
+        node_limit = self._visited_nodes + max_nodes if max_nodes >= 0 else math.inf
+        indexes_buf = self.__indexes_buf
+        unions = self.__unions_buf
+        inters = self.__inters_buf
+        positions = self.__positions_buf
+        observer = self.__observer
+
+        base = len(indexes)
+        indexes_buf[0:base] = indexes
+        level = base
+        unions[level] = union_value
+        inters[level] = inter
+        positions[level] = first
+
+        while level >= base:
+            inter = inters[level]
+            rest = inter >> positions[level]
+
+            # All the rows of this level have been tried, go back up.
+            if rest == 0:
+                level -= 1
+                continue
 
-                if is_cov:
-                    self._coverages.append(np.array(indexes_temp))
-                    if self.__use_stack:
-                        indexes_temp.pop()
-                else:
-                    inter_temp = np.bitwise_and(
-                        inter[0:k], self._compat_matrix[0:k, k])
-                    if np.any(inter_temp != 0):
-                        self.__esplora(
-                            indexes_temp, union_value_temp, inter_temp)
+            # Jump to the next compatible row, ie the lowest set bit left.
+            k = positions[level] + (rest & -rest).bit_length() - 1
+            positions[level] = k
+
+            if self.__should_stop():
+                if self.__checkpoint_file is not None:
+                    self.__frontier_left += self.__frontier(base, level)
+                break
 
-                    if self.__use_stack:
-                        indexes_temp.pop()
+            self.__save_checkpoint_if_due(base, level)
+
+            if self._visited_nodes >= node_limit:
+                frontier.extend(self.__frontier(base, level))
+                return
+
+            positions[level] = k + 1
+            self._visited_nodes += 1
+            if observer is not None:
+                observer.on_node(level + 1)
+
+            # Try to add A[k] to the coverage.
+            indexes_buf[level] = k
+            union_value_temp, is_cov = self._get_union_value_temp(
+                unions[level], k)
+
+            if is_cov:
+                self._coverage_count += 1
+                if observer is not None:
+                    observer.on_coverage(level + 1)
+                if not self.__count_only:
+                    yield indexes_buf[0:level + 1].copy()
+                continue
+
+            inter_temp = inter & self._compat_matrix.column(k)
+            if inter_temp != 0 and self.__feasible(indexes_buf[0:level + 1], inter_temp):
+                if observer is not None:
+                    observer.on_branch(level + 1, bin(inter_temp).count('1'))
+                level += 1
+                unions[level] = union_value_temp
+                inters[level] = inter_temp
+                positions[level] = 0
+
+    def __feasible(self, indexes, candidates: int) -> bool:
+        # With prune, checks that every column not covered by the rows in indexes
+        # is covered by some candidate row, otherwise the subtree is cut.
+        if not self.__prune:
+            return True
+
+        row_masks = self.__row_masks
+        missing = self.__full_mask
+        for k in indexes:
+            missing &= ~row_masks[k]
+
+        while candidates and missing:
+            low = candidates & -candidates
+            missing &= ~row_masks[low.bit_length() - 1]
+            candidates ^= low
+
+        if missing:
+            self._pruned_nodes += 1
+            return False
+
+        return True
+
+    def __frontier(self, base, level):
+        # The rows not yet tried at every level of the stack,
+        # each one is an independent subtree.
+        frontier = []
+        for lev in range(base, level + 1):
+            position = self.__positions_buf[lev]
+            if self.__inters_buf[lev] >> position != 0:
+                frontier.append((self.__indexes_buf[0:lev].copy(),
+                                 self.__inters_buf[lev],
+                                 self.__unions_buf[lev],
+                                 position))
+
+        return frontier
+
+    def __save_checkpoint_if_due(self, base: int = 0, level: int = -1):
+        # base and level are the ones of the running __esplora_iter, if any.
+        if self.__checkpoint_file is None or time.monotonic() < self.__next_checkpoint:
+            return
+
+        self.__save_checkpoint(self.__frontier_left + self.__frontier(base, level))
+        self.__next_checkpoint = time.monotonic() + self.__checkpoint_interval
+
+    def __save_checkpoint(self, frontier: list):
+        i, j = self.__position
+        write_checkpoint(self.__checkpoint_file, Checkpoint(
+            fingerprint=self.__get_fingerprint(),
+            plus=isinstance(self, ECPlus),
+            count_only=self.__count_only,
+            precompute=self.__precompute,
+            prune=self.__prune,
+            i=i,
+            j=j,
+            frontier=frontier,
+            columns=[self._compat_matrix.column(k) for k in range(self._n)],
+            coverages=self.__found,
+            visited_nodes=self._visited_nodes,
+            pruned_nodes=self._pruned_nodes,
+            coverage_count=self._coverage_count,
+            execution_time=self.__previous_time + self.__execution_time()))
+
+    def __get_fingerprint(self) -> str:
+        if self.__fingerprint is None:
+            self.__fingerprint = fingerprint(self._input_matrix)
+        return self.__fingerprint
 
     def __execution_time(self) -> float:
         return time.process_time() - self.__start_time
@@ -181,23 +628,69 @@ class EC:  # pylint: disable=too-many-instance-attributes
 
         return self.__execution_time() > self.__time_limit
 
+    def __coverage_limit_reached(self) -> bool:
+        return 0 <= self.__max_coverages <= self._coverage_count
+
+    def __memory_limit_reached(self) -> bool:
+        if self.__max_memory < 0:
+            return False
+
+        return peak_memory() > self.__max_memory
+
     def __should_stop(self) -> bool:
-        if self.__stop_flag:
+        # Once a budget is over, the search stops for good.
+        if self.__stop_reason is not None:
             return True
 
-        return self.__time_limit_reached()
+        if self.__stop_flag:
+            self.__stop_reason = 'stopped'
+        elif self.__coverage_limit_reached():
+            self.__stop_reason = 'coverages'
+        elif 0 <= self.__max_nodes <= self._visited_nodes - self.__start_nodes:
+            self.__stop_reason = 'nodes'
+        else:
+            # Reading the time and the memory is slow, so it is done only every few checks.
+            self.__check_countdown -= 1
+            if self.__check_countdown > 0:
+                return False
+
+            self.__check_countdown = self.__check_interval
+            if self.__time_limit_reached():
+                self.__stop_reason = 'time'
+            elif self.__memory_limit_reached():
+                self.__stop_reason = 'memory'
+
+        return self.__stop_reason is not None
 
 
 class ECPlus(EC):
     """Implementation of the EC plus algorithm.
     """
 
-    def __init__(self, input_matrix: InputMatrix, time_limit: float = -1, use_stack: bool = False):
-        super().__init__(input_matrix, time_limit, use_stack)
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 input_matrix: InputMatrix,
+                 time_limit: float = -1,
+                 use_stack: bool = False,
+                 use_iterative: bool = False,
+                 compat_matrix: Optional[CompatMatrix] = None,
+                 count_only: bool = False,
+                 max_coverages: int = -1,
+                 checkpoint_file: Optional[str] = None,
+                 checkpoint_interval: float = 60,
+                 precompute: bool = False,
+                 prune: bool = False,
+                 observer: Optional[SearchObserver] = None,
+                 max_nodes: int = -1,
+                 max_memory: float = -1,
+                 check_interval: int = 1024):
+        super().__init__(input_matrix, time_limit, use_stack,
+                         use_iterative, compat_matrix, count_only, max_coverages,
+                         checkpoint_file, checkpoint_interval, precompute, prune, observer,
+                         max_nodes, max_memory, check_interval)
         self.__card = input_matrix.nonzero_per_row()
 
-    def start(self):
-        result = super().start()
+    def result(self) -> Result:
+        result = super().result()
         result.plus = True
         return result
 
@@ -210,116 +703,419 @@ class ECPlus(EC):
         return union_value_temp, union_value_temp == self._m
 
 
-def read_from_file(input_file: str, use_sparse: bool = False) -> Tuple[InputMatrix, bool, int]:
+def _set_bits(bitset: int) -> Iterator[int]:
+    # The indexes of the set bits of a bitset, from the lowest one.
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+def peak_memory() -> float:
+    """Returns the peak memory used by the process so far.
+
+    Returns:
+        float: The peak resident memory in MB, 0 if it cannot be read on this platform.
+    """
+    if resource is None:
+        return 0.0
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # The peak is in bytes on macOS and in KB elsewhere.
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def read_from_file(input_file: str,
+                   use_sparse: bool = False,
+                   use_bitset: bool = False) -> Tuple[InputMatrix, bool, int]:
     """Reads an input matrix from a file.
     Refer to the documentation for the format of the input file.
 
     Args:
         input_file (str): The path of the input file.
         use_sparse (bool): If True, the input matrix is returned as a sparse matrix.
+        use_bitset (bool): If True, the input matrix is returned as a bitset matrix.
 
     Returns:
         np.ndarray: The input matrix read from the file.
     """
 
-    input_matrix = []
-    is_sudoku = False
-    dim = 0
+    if binary.is_binary(input_file):
+        # Only the sparse matrix is mapped in memory, the other ones are built from it:
+        # the bitset one from the uint8 values, and the dense one as the text files.
+        rows, is_sudoku, dim, _ = binary.read_binary(input_file)
+        if use_sparse:
+            return SparseInputMatrix(rows), is_sudoku, dim
+        if use_bitset:
+            return BitsetInputMatrix(rows.toarray()), is_sudoku, dim
+        return DenseInputMatrix(rows.astype(int).toarray()), is_sudoku, dim
 
-    with open(input_file, "r", encoding="utf-8") as file:
-        for line in file:
-            if 'Sudoku' in line:
-                is_sudoku = True
-                continue
+    with open(input_file, "rb") as file:
+        comments = __read_header(file)
+        is_sudoku = any('Sudoku' in comment for comment in comments)
+        dim = next((int(comment.split()[-1]) for comment in comments
+                    if 'Dimension' in comment), 0)
 
-            if 'Dimension' in line:
-                dim = int(line.split()[-1])
-                continue
+        if use_sparse:
+            return SparseInputMatrix(__blocks2csr(__read_blocks(file))), is_sudoku, dim
 
-            if ';;;' in line:
-                continue
+        blocks = list(__read_blocks(file))
+
+    matrix = np.concatenate(blocks) if blocks else np.zeros((0, 0), dtype=np.uint8)
+    if use_bitset:
+        return BitsetInputMatrix(matrix), is_sudoku, dim
+    return DenseInputMatrix(matrix.astype(int)), is_sudoku, dim
+
+
+def read_comments(input_file: str) -> List[str]:
+    """Reads the comments at the start of a text input file, eg the ones of the generator.
+
+    Args:
+        input_file (str): The path of the input file.
 
-            if '-' in line:
-                line = list(line.split())
-                elements = []
-                for element in line[0:-1]:
-                    elements.append(int(element))
-                input_matrix.append(elements)
+    Returns:
+        List[str]: The comments, without the leading ';;;'.
+    """
+    with open(input_file, "rb") as file:
+        return __read_header(file)
 
-    converted_matrix = SparseInputMatrix(
-        input_matrix) if use_sparse else DenseInputMatrix(input_matrix)
-    return converted_matrix, is_sudoku, dim
 
+def read_shape(input_file: str) -> Tuple[int, int]:
+    """Reads the shape of the input matrix of a file, without reading the matrix.
+    The shape of a binary instance is in its header, while the one of a text instance
+    is estimated from its first row, as all the rows take the same number of bytes.
 
-def write_output(output_file: str,
+    Args:
+        input_file (str): The path of the input file.
+
+    Returns:
+        Tuple[int, int]: The number of rows and of columns of the input matrix.
+    """
+    if binary.is_binary(input_file):
+        return binary.read_shape(input_file)
+
+    with open(input_file, "rb") as file:
+        __read_header(file)
+        start = file.tell()
+
+        # The first row ends with a '-', even if it was wrapped on many lines.
+        row = b''
+        while b'-' not in row:
+            line = file.readline()
+            if not line:
+                return 0, 0
+            row += line
+
+    m = sum(1 for value in row.split() if value.isdigit())
+    return round((os.path.getsize(input_file) - start) / len(row)), m
+
+
+def write_coverages(coverages_file: str,
+                    coverages: Iterable[np.ndarray],
+                    is_sudoku: bool = False,
+                    flush_interval: float = 1.0,
+                    max_pending: int = 1 << 16):
+    """Writes the coverages to a file as soon as they are found,
+    so that they are not lost if the program crashes.
+    The file can then be given to write_output.
+
+    Args:
+        coverages_file (str): The path of the file.
+        coverages (Iterable[np.ndarray]): The coverages, eg from EC.iter_coverages.
+        is_sudoku (bool, optional): True if the input is a sudoku. Defaults to False.
+        flush_interval (float, optional): Maximum number of seconds between two flushes.
+                                          Defaults to 1.0.
+        max_pending (int, optional): Maximum number of coverages formatted at once.
+                                     Defaults to 65536.
+    """
+    with open(coverages_file, "wb") as file:
+        last_flush = time.monotonic()
+        pending = []
+        try:
+            for coverage in coverages:
+                # Same as write_output, where Sudoku.from_cover sorts the coverage.
+                if is_sudoku:
+                    coverage = np.sort(coverage)
+                pending.append(coverage + 1)
+
+                if len(pending) >= max_pending or time.monotonic() - last_flush > flush_interval:
+                    file.write(output.format_arrays(*output.join_arrays(pending)))
+                    file.flush()
+                    pending = []
+                    last_flush = time.monotonic()
+        finally:
+            file.write(output.format_arrays(*output.join_arrays(pending)))
+
+
+def write_output(output_file: str,  # pylint: disable=too-many-arguments
                  input_matrix: InputMatrix,
                  result: Result,
                  is_sudoku: bool = False,
-                 dim: int = 0):
+                 dim: int = 0,
+                 coverages_file: Optional[str] = None,
+                 write_sets: bool = True,
+                 render_sudoku: bool = True,
+                 coverage_format: str = 'text'):
     """Writes the output of the EC algorithm to a file.
+    The sets and the coverages are formatted in bulk, and written with few large writes.
 
     Args:
         output_file (str): The path of the output file.
         input_matrix (np.ndarray): The input matrix.
-        coverages (np.ndarray): The exact coverages found by the EC algorithm.
-        visited_count (int): The number of nodes visited by the EC algorithm.
-        execution_time (float): The execution time of the algorithm.
+        result (Result): The result of the algorithm.
+        is_sudoku (bool, optional): True if the input is a sudoku. Defaults to False.
+        dim (int, optional): The dimension of the sudoku. Defaults to 0.
+        coverages_file (str, optional): A file written by write_coverages,
+                                        whose coverages are written instead of
+                                        the ones in the result. Defaults to None.
+        write_sets (bool, optional): Write the sets of the input matrix. Defaults to True.
+        render_sudoku (bool, optional): Write the sudoku of every coverage. Defaults to True.
+        coverage_format (str, optional): The format of the coverages, one of
+                                         output.COVERAGE_FORMATS. Only the 'text' one can be
+                                         read without read_result. Defaults to 'text'.
     """
-    with open(output_file, "w", encoding="utf-8") as file:
+    with open(output_file, "wb") as file:
         exec_time_minutes = round(result.execution_time / 60, 3)
 
-        file.write(
-            f';;; EC Algorithm ({"Plus version" if result.plus else "Base version"})\n')
-        file.write(f';;; Executed at: {datetime.today()}\n')
-        file.write(
+        header = io.StringIO()
+        if result.engine == 'DLX':
+            header.write(';;; DLX Algorithm (Dancing Links)\n')
+        else:
+            header.write(
+                f';;; EC Algorithm ({"Plus version" if result.plus else "Base version"})\n')
+        header.write(f';;; Executed at: {datetime.today()}\n')
+        header.write(
             f';;; Execution time: {result.execution_time}s ({exec_time_minutes} minutes) \n')
-        file.write(f';;; Stopped: {result.stopped}\n')
-        file.write(f';;; Time limit reached: {result.time_limit_reached}\n')
-        file.write(f';;; Nodes visited: {result.visited_nodes}\n')
-        file.write(f';;; Total nodes: {result.total_nodes}\n')
-        file.write(
+        header.write(f';;; Stopped: {result.stopped}\n')
+        header.write(f';;; Time limit reached: {result.time_limit_reached}\n')
+        header.write(f';;; Stop reason: {result.stop_reason}\n')
+        header.write(f';;; Coverage limit reached: {result.coverage_limit_reached}\n')
+        header.write(f';;; Coverages found: {result.coverage_count}\n')
+        header.write(f';;; Nodes visited: {result.visited_nodes}\n')
+        header.write(f';;; Subtrees pruned: {result.pruned_nodes}\n')
+        header.write(f';;; Total nodes: {result.total_nodes}\n')
+        header.write(
             f';;; Percentage of nodes visited: {result.visited_percentage()}%\n')
-        file.write(';;;\n')
-
-        if is_sudoku:
-            file.write(';;; Sudoku solutions: \n')
-            for coverage in result.coverages:
+        if result.reduction is not None:
+            __write_reduction(header, result.reduction)
+        if result.components is not None:
+            sizes = ', '.join(f'{rows}x{cols}' for rows, cols in result.components)
+            header.write(f';;; Components: {len(result.components)} ({sizes})\n')
+        if result.order is not None:
+            header.write(f';;; Row order: {result.order}\n')
+        if result.stats is not None:
+            header.write(f';;; Stats: {json.dumps(result.stats)}\n')
+        header.write(';;;\n')
+        file.write(header.getvalue().encode())
+
+        if is_sudoku and render_sudoku:
+            # The solutions are written one at a time, as the streamed coverages are read.
+            file.write(b';;; Sudoku solutions: \n')
+            coverages = result.coverages if coverages_file is None \
+                else __read_coverages(coverages_file)
+            for coverage in coverages:
                 solution = sudoku.Sudoku.from_cover(coverage, dim)
-                file.write(sudoku.sudoku2str(solution, ";;; "))
-                file.write('\n;;;\n')
-
-        idx = 1
-        for i in input_matrix:
-            file.write(f';;; Set {idx:>3}: {np.array2string(i)}\n')
-            idx += 1
-
-        file.write(';;;\n')
-        file.write(';;; Exact Coverages:\n')
-        if result.coverages == []:
-            file.write(';;; No coverage found.\n')
+                file.write(f'{sudoku.sudoku2str(solution, ";;; ")}\n;;;\n'.encode())
+
+        if write_sets:
+            output.write_sets(file, input_matrix.to_sparse())
+
+        file.write(b';;;\n')
+        file.write(b';;; Exact Coverages:\n')
+        if coverages_file is not None and os.path.getsize(coverages_file) > 0:
+            if coverage_format == 'text':
+                with open(coverages_file, "rb") as coverages:
+                    shutil.copyfileobj(coverages, file)
+            else:
+                __write_binary_coverages(file, lambda: __read_coverage_chunks(coverages_file),
+                                         input_matrix.shape[0], coverage_format)
+        elif result.count_only:
+            file.write(b';;; Coverages not listed (count only).\n')
+        elif coverages_file is not None or result.coverages == []:
+            file.write(b';;; No coverage found.\n')
+        elif coverage_format == 'text':
+            # The coverages are formatted a batch at a time, to bound the memory.
+            for first in range(0, len(result.coverages), 1 << 16):
+                values, lengths = output.join_arrays(result.coverages[first:first + (1 << 16)])
+                file.write(output.format_arrays(values + 1, lengths))
         else:
-            for coverage in result.coverages:
-                file.write(f'{coverage+1}\n')
-
-
-def read_result(file_name: str) -> Result:
+            values, lengths = output.join_arrays(result.coverages)
+            __write_binary_coverages(file, lambda: [(values, lengths)],
+                                     input_matrix.shape[0], coverage_format)
+
+
+def __write_reduction(file, stats: dict):
+    file.write(f';;; Reduced rows: {stats["rows"]} -> {stats["reduced rows"]} '
+               f'(empty: {stats["empty rows"]}, duplicate: {stats["duplicate rows"]}, '
+               f'forced: {stats["forced rows"]}, conflicting: {stats["conflicting rows"]})\n')
+    file.write(f';;; Reduced columns: {stats["columns"]} -> {stats["reduced columns"]}\n')
+    file.write(f';;; Infeasible: {stats["infeasible"]}\n')
+
+
+def __read_header(file) -> List[str]:
+    # Reads the ';;;' lines, and leaves the file at the first row of the matrix.
+    comments = []
+    while True:
+        start = file.tell()
+        line = file.readline()
+        if not line.startswith(b';;;'):
+            file.seek(start)
+            return comments
+        comments.append(line[3:].decode("utf-8").strip())
+
+
+__WHITESPACE = np.frombuffer(b' \t\r\n', dtype=np.uint8)
+
+
+def __read_blocks(file, chunk_size: int = 1 << 22) -> Iterator[np.ndarray]:
+    # Parses the rows of the matrix a chunk at a time, without splitting the lines:
+    # every element is a single digit, and every row ends with a '-'
+    # (even if np.array2string wrapped it on many lines).
+    # The rows of every chunk are returned as a block of uint8.
+    pending = np.zeros(0, dtype=np.uint8)
+    last_digit = False
+    n_cols = None
+
+    while True:
+        chunk = np.frombuffer(file.read(chunk_size), dtype=np.uint8)
+        if len(chunk) == 0:
+            return
+
+        is_digit = (chunk >= ord('0')) & (chunk <= ord('9'))
+        if np.any(is_digit[1:] & is_digit[:-1]) or (last_digit and is_digit[0]):
+            raise ValueError('The elements of the input matrix must be single digits')
+        last_digit = bool(is_digit[-1])
+
+        # Eg the '...' of the rows summarized by np.array2string.
+        is_symbol = is_digit | (chunk == ord('-'))
+        if not np.all(is_symbol | np.isin(chunk, __WHITESPACE)):
+            raise ValueError('Invalid character in the input matrix')
+
+        symbols = np.concatenate((pending, chunk[is_symbol]))
+        ends = np.flatnonzero(symbols == ord('-'))
+        if len(ends) == 0:
+            pending = symbols
+            continue
+
+        pending = symbols[ends[-1] + 1:]
+        symbols = symbols[:ends[-1] + 1]
+
+        lengths = np.diff(ends, prepend=-1) - 1
+        if n_cols is None:
+            n_cols = int(lengths[0])
+        if np.any(lengths != n_cols):
+            raise ValueError('The rows of the input matrix must have the same length')
+
+        digits = symbols[symbols != ord('-')] - ord('0')
+        yield digits.reshape(len(ends), n_cols)
+
+
+def __blocks2csr(blocks: Iterable[np.ndarray]) -> sparse.csr_matrix:
+    # Only the ones of every block are kept, so the memory is bounded by the CSR matrix.
+    indptr = [np.zeros(1, dtype=np.int64)]
+    indices = [np.zeros(0, dtype=np.int32)]
+    data = [np.zeros(0, dtype=int)]
+    n_cols = 0
+    for block in blocks:
+        rows, cols = np.nonzero(block)
+        indptr.append(indptr[-1][-1] + np.cumsum(np.bincount(rows, minlength=len(block))))
+        indices.append(cols.astype(np.int32))
+        data.append(block[rows, cols].astype(int))
+        n_cols = block.shape[1]
+
+    indptr = np.concatenate(indptr)
+    return sparse.csr_matrix((np.concatenate(data), np.concatenate(indices), indptr),
+                             shape=(len(indptr) - 1, n_cols))
+
+
+def __read_coverages(coverages_file: str) -> Iterator[np.ndarray]:
+    for values, lengths in __read_coverage_chunks(coverages_file):
+        yield from output.split_arrays(values, lengths)
+
+
+def __read_coverage_chunks(coverages_file: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # The streamed coverages, 0-based, a chunk at a time so that they are never all in memory.
+    with open(coverages_file, "rb") as file:
+        for values, lengths in output.iter_arrays(file):
+            yield values - 1, lengths
+
+
+def __write_binary_coverages(file, read_chunks, n_rows: int, coverage_format: str):
+    # The archive follows the header, until the end of the file.
+    file.write(f';;; Coverages format: {coverage_format}\n'.encode())
+    output.write_binary_coverage_chunks(file, read_chunks, n_rows,
+                                        compressed=coverage_format == 'compressed')
+
+
+def read_result(file_name: str, with_coverages: bool = True) -> Result:
     """Reads the search result from a file.
 
     Args:
         file_name (str): The path of the file.
+        with_coverages (bool, optional): Read also the coverages, otherwise
+                                         only the statistics are read. Defaults to True.
 
     Returns:
-        ECResult: The search result.
+        ECResult: The search result. Without the number of coverages in the header,
+                  as in the files of older versions, it is the number of coverages read.
     """
     stopped = False
     visited_count = 0
+    pruned_count = 0
     total_nodes = 0
     execution_time = 0
     time_limit_reached = False
+    coverage_count = None
     coverages = []
-
-    with open(file_name, 'r', encoding='utf-8') as file:
+    plus = False
+    engine = 'EC'
+    stop_reason = None
+    reduction = None
+    components = None
+    row_order = None
+    count_only = False
+
+    with open(file_name, 'rb') as file:
         for line in file:
+            line = line.decode('utf-8')
+            if ';;; DLX Algorithm' in line:
+                engine = 'DLX'
+                continue
+
+            if ';;; EC Algorithm' in line:
+                plus = 'Plus version' in line
+                continue
+
+            if ';;; Stop reason' in line:
+                stop_reason = None if line.split()[3] == 'None' else line.split()[3]
+                continue
+
+            if ';;; Reduced rows' in line:
+                numbers = [int(number) for number in re.findall(r'\d+', line)]
+                reduction = dict(zip(['rows', 'reduced rows', 'empty rows', 'duplicate rows',
+                                      'forced rows', 'conflicting rows'], numbers))
+                continue
+
+            if ';;; Reduced columns' in line and reduction is not None:
+                numbers = [int(number) for number in re.findall(r'\d+', line)]
+                reduction.update(zip(['columns', 'reduced columns'], numbers))
+                continue
+
+            if ';;; Infeasible' in line and reduction is not None:
+                reduction['infeasible'] = 'True' in line
+                continue
+
+            if ';;; Components' in line:
+                components = [(int(rows), int(cols))
+                              for rows, cols in re.findall(r'(\d+)x(\d+)', line)]
+                continue
+
+            if ';;; Row order' in line:
+                row_order = line.split()[3]
+                continue
+
             if ';;; Stopped' in line:
                 if 'True' in line:
                     stopped = True
@@ -329,6 +1125,10 @@ def read_result(file_name: str) -> Result:
                 visited_count = int(line.split()[3])
                 continue
 
+            if ';;; Subtrees pruned' in line:
+                pruned_count = int(line.split()[3])
+                continue
+
             if ';;; Total nodes' in line:
                 total_nodes = int(line.split()[3])
                 continue
@@ -342,17 +1142,45 @@ def read_result(file_name: str) -> Result:
                 time_limit_reached = bool(line.split()[4])
                 continue
 
+            if ';;; Coverages found' in line:
+                coverage_count = int(line.split()[3])
+                continue
+
+            if ';;; Exact Coverages' in line and not with_coverages:
+                count_only = file.readline().startswith(b';;; Coverages not listed')
+                break
+
             if ';;; Exact Coverages' in line:
-                for cov_line in file:
-                    cov = list(list(map(int, cov_line[1:-2].split())))
-                    coverages.append(cov)
-                # Coverages are at the end of the file
-                # so we can just stop iterating.
+                # Coverages are at the end of the file, in the text format
+                # or in one of the binary ones.
+                data = file.read()
+                count_only = data.startswith(b';;; Coverages not listed')
+                if data.startswith(b';;; Coverages format:'):
+                    values, lengths = output.read_binary_coverages(data.partition(b'\n')[2])
+                    values = values + 1
+                else:
+                    # The notes, eg when no coverage is found, are skipped.
+                    values, lengths = output.parse_arrays(data)
+                coverages = [coverage.tolist()
+                             for coverage in output.split_arrays(values, lengths)]
                 break
 
+    # The files written before the count was in the header list all their coverages.
+    if coverage_count is None:
+        coverage_count = len(coverages)
+
     return Result(coverages=coverages,
                   visited_nodes=visited_count,
                   total_nodes=total_nodes,
                   execution_time=execution_time,
                   stopped=stopped,
-                  time_limit_reached=time_limit_reached)
+                  time_limit_reached=time_limit_reached,
+                  plus=plus,
+                  engine=engine,
+                  coverage_count=coverage_count,
+                  count_only=count_only,
+                  reduction=reduction,
+                  components=components,
+                  pruned_nodes=pruned_count,
+                  order=row_order,
+                  stop_reason=stop_reason)
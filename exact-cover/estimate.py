@@ -0,0 +1,120 @@
+"""estimate.py
+Estimation of the size of the tree explored by EC, without exploring it.
+"""
+
+from dataclasses import dataclass
+import time
+from typing import Optional, Tuple
+import numpy as np
+from scipy import sparse
+from input_matrix import InputMatrix
+
+
+@dataclass
+class Estimate:
+    """Represents an estimate of the tree explored by the EC algorithm."""
+
+    nodes: float
+    nodes_error: float
+    coverages: float
+    samples: int
+    execution_time: float
+
+
+def estimate_tree(input_matrix: InputMatrix,
+                  samples: int = 1000,
+                  prune: bool = False,
+                  seed: Optional[int] = None) -> Estimate:
+    """Estimates the number of nodes visited by EC (and EC plus) and the number of coverages,
+    with Knuth's estimator: every sample follows a random path from the root to a leaf,
+    and estimates the nodes at every depth as the product of the branching factors above it.
+    The estimates are unbiased, and their error decreases with the number of samples.
+
+    Args:
+        input_matrix (InputMatrix): The input matrix.
+        samples (int, optional): The number of random paths. Defaults to 1000.
+        prune (bool, optional): Estimate the tree of EC with prune. Defaults to False.
+        seed (int, optional): The seed of the random paths. Defaults to None.
+
+    Returns:
+        Estimate: The mean of the estimates of the samples,
+                  with the standard error of the nodes.
+    """
+    start_time = time.process_time()
+
+    rows = input_matrix.to_sparse().tocsr().astype(bool).astype(np.int32)
+    rng = np.random.default_rng(seed)
+
+    nodes = np.zeros(samples)
+    coverages = np.zeros(samples)
+    for sample in range(samples):
+        nodes[sample], coverages[sample] = __sample_path(rows, rng, prune)
+
+    nodes_error = nodes.std(ddof=1) / np.sqrt(samples) if samples > 1 else 0.0
+
+    return Estimate(nodes=float(nodes.mean()) if samples > 0 else 0.0,
+                    nodes_error=float(nodes_error),
+                    coverages=float(coverages.mean()) if samples > 0 else 0.0,
+                    samples=samples,
+                    execution_time=time.process_time() - start_time)
+
+
+def __sample_path(rows: sparse.csr_matrix,
+                  rng: np.random.Generator,
+                  prune: bool) -> Tuple[float, float]:
+    # The tree is the one of EC: the children of the root are all the rows,
+    # the children of row i are all the rows j < i, even if not disjoint from it,
+    # and the children of a deeper node are the rows below the last one added
+    # that are disjoint from the union of its set.
+    # B has no column for the empty rows, so a node adding one is a leaf.
+    n, m = rows.shape
+    if n == 0:
+        return 0.0, 0.0
+
+    def cols(k):
+        return rows.indices[rows.indptr[k]:rows.indptr[k + 1]]
+
+    weight = float(n)
+    nodes = weight
+
+    i = int(rng.integers(n))
+    union = np.zeros(m, dtype=bool)
+    union[cols(i)] = True
+    if not union.any():
+        return nodes, 0.0
+    if union.all():
+        return nodes, weight
+    if i == 0:
+        return nodes, 0.0
+
+    weight *= i
+    nodes += weight
+
+    k = int(rng.integers(i))
+    if union[cols(k)].any():
+        return nodes, 0.0
+    union[cols(k)] = True
+
+    while not union.all():
+        if len(cols(k)) == 0:
+            return nodes, 0.0
+
+        conflicts = rows[:k] @ union.astype(np.int32)
+        candidates = np.flatnonzero(conflicts == 0)
+        if len(candidates) == 0:
+            return nodes, 0.0
+
+        # Same check as EC with prune: the columns left must be covered by some candidate.
+        if prune:
+            covered = union.copy()
+            covered[rows[candidates].indices] = True
+            if not covered.all():
+                return nodes, 0.0
+
+        weight *= len(candidates)
+        nodes += weight
+
+        k = int(rng.choice(candidates))
+        union[cols(k)] = True
+
+    return nodes, weight
@@ -10,6 +10,9 @@ from scipy import sparse
 # Generic type variable for the internal representation of the input matrix.
 T = TypeVar('T')
 
+# int.bit_count() is only available from Python 3.10.
+_popcount = getattr(int, 'bit_count', lambda x: bin(x).count('1'))
+
 
 class InputMatrix(ABC, Generic[T]):
     """Represents a generic input matrix."""
@@ -98,6 +101,27 @@ class InputMatrix(ABC, Generic[T]):
         """
         pass
 
+    @abstractmethod
+    def row_nonzero(self, i: int) -> np.ndarray:
+        """Computes the indexes of the columns with a one in a row of the matrix.
+
+        Args:
+            i (int): The index of the row.
+
+        Returns:
+            np.ndarray: The sorted indexes of the columns.
+        """
+        pass
+
+    @abstractmethod
+    def to_sparse(self) -> sparse.csr_matrix:
+        """Converts the matrix to a scipy sparse matrix, eg for batched products.
+
+        Returns:
+            sparse.csr_matrix: The matrix in CSR format.
+        """
+        pass
+
     @abstractmethod
     def nonzero_per_row(self) -> T:
         """Computes the number of ones per row."""
@@ -140,6 +164,13 @@ class SparseInputMatrix(InputMatrix[sparse.spmatrix]):
         union = self._input_matrix[i] + array
         return union, union.nnz
 
+    def row_nonzero(self, i: int) -> np.ndarray:
+        start, end = self._input_matrix.indptr[i:i + 2]
+        return np.sort(self._input_matrix.indices[start:end])
+
+    def to_sparse(self) -> sparse.csr_matrix:
+        return self._input_matrix
+
     def nonzero_per_row(self) -> sparse.spmatrix:
         return self._input_matrix.getnnz(axis=1)
 
@@ -163,7 +194,8 @@ class DenseInputMatrix(InputMatrix[np.ndarray]):
     """Represents a dense input matrix."""
 
     def __init__(self, input_matrix: list) -> None:
-        super().__init__(np.array(input_matrix))
+        # asarray does not copy arrays, eg the ones in shared memory.
+        super().__init__(np.asarray(input_matrix))
 
     def row_empty(self, i: int) -> bool:
         return not np.any(self._input_matrix[i])
@@ -182,6 +214,12 @@ class DenseInputMatrix(InputMatrix[np.ndarray]):
         union = np.bitwise_or(self._input_matrix[i], array)
         return union, np.count_nonzero(union)
 
+    def row_nonzero(self, i: int) -> np.ndarray:
+        return np.flatnonzero(self._input_matrix[i])
+
+    def to_sparse(self) -> sparse.csr_matrix:
+        return sparse.csr_matrix(self._input_matrix)
+
     def nonzero_per_row(self) -> np.ndarray:
         return np.count_nonzero(self._input_matrix, axis=1)
 
@@ -196,3 +234,79 @@ class DenseInputMatrix(InputMatrix[np.ndarray]):
 
     def __sizeof__(self) -> int:
         return self._input_matrix.nbytes
+
+
+class BitsetInputMatrix(InputMatrix[int]):
+    """Represents an input matrix where each row is packed into a bitset.
+
+    Every row is stored as a python int, where the j-th bit is set
+    if the j-th element of M belongs to the set.
+    Intersections and unions are then a single AND/OR between two ints,
+    and the number of ones is obtained with a popcount.
+    """
+
+    def __init__(self, input_matrix: list) -> None:  # pylint: disable=super-init-not-called
+        rows = np.array(input_matrix, dtype=np.uint8, ndmin=2)
+        self.shape = rows.shape
+
+        # Bit j of the packed bytes (little endian) is column j of the row.
+        packed = np.packbits(rows, axis=1, bitorder='little')
+        self._input_matrix = [int.from_bytes(row.tobytes(), 'little')
+                              for row in packed]
+
+        self.__full = (1 << self.shape[1]) - 1
+
+    def row_empty(self, i: int) -> bool:
+        return self._input_matrix[i] == 0
+
+    def row_full(self, i: int) -> bool:
+        return self._input_matrix[i] == self.__full
+
+    def intersection(self, i: int, array: int) -> Tuple[int, int]:
+        inter = self._input_matrix[i] & array
+        return inter, _popcount(inter)
+
+    def rows_intersection(self, i: int, j: int) -> Tuple[int, int]:
+        return self.intersection(i, self._input_matrix[j])
+
+    def union(self, i: int, array: int) -> Tuple[int, int]:
+        union = self._input_matrix[i] | array
+        return union, _popcount(union)
+
+    def row_nonzero(self, i: int) -> np.ndarray:
+        row = self._input_matrix[i]
+        cols = []
+        while row:
+            low = row & -row
+            cols.append(low.bit_length() - 1)
+            row ^= low
+        return np.array(cols, dtype=int)
+
+    def to_sparse(self) -> sparse.csr_matrix:
+        return sparse.csr_matrix(np.array(list(self)))
+
+    def nonzero_per_row(self) -> np.ndarray:
+        return np.fromiter(map(_popcount, self._input_matrix), dtype=int,
+                           count=self.shape[0])
+
+    def nonzero_per_col(self) -> np.ndarray:
+        return np.count_nonzero(np.array(list(self)), axis=0)
+
+    def rows_union(self, i: int, j: int) -> Tuple[int, int]:
+        return self.union(i, self._input_matrix[j])
+
+    def is_valid(self) -> bool:
+        union = 0
+        for row in self._input_matrix:
+            union |= row
+        return union == self.__full
+
+    def __iter__(self):
+        for row in self._input_matrix:
+            packed = np.frombuffer(row.to_bytes(
+                (self.shape[1] + 7) // 8, 'little'), dtype=np.uint8)
+            yield np.unpackbits(packed, count=self.shape[1],
+                                bitorder='little').astype(int)
+
+    def __sizeof__(self) -> int:
+        return sum(map(lambda row: row.__sizeof__(), self._input_matrix))
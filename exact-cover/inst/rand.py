@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Optional
 import numpy as np
 from scipy import sparse
+import binary
 
 
 @dataclass
@@ -21,11 +22,12 @@ class RandomInstance:
     gen_at: datetime = datetime.today()
 
 
-def gen_inst(card_m: int,
+def gen_inst(card_m: int,  # pylint: disable=too-many-arguments
              card_n: int,
              prob: float,
              guarantee_sol: bool,
-             include_sparse: bool = False) -> RandomInstance:
+             include_sparse: bool = False,
+             seed: Optional[int] = None) -> RandomInstance:
     """Generates an instance of the EC problem.
 
     Args:
@@ -34,6 +36,7 @@ def gen_inst(card_m: int,
         prob (float): The probability of a bit to be 1. Must be between 0 and 1.
         guarantee_sol (bool): True if the instance must have at least one solution.
         include_sparse (bool): True if the instance must include a sparse matrix representation. (default: False)
+        seed (int, optional): The seed of np.random, if given. Defaults to None.
 
 
     Returns:
@@ -48,6 +51,9 @@ def gen_inst(card_m: int,
     if card_n >= 2**card_m:
         raise ValueError('N must be less than 2^M')
 
+    if seed is not None:
+        np.random.seed(seed)
+
     input_matrix = np.empty((card_n, card_m), dtype=int)
 
     # Where to start the random generation.
@@ -96,24 +102,128 @@ def gen_inst(card_m: int,
                           fixed_zero_col=fixed_zero_col)
 
 
-def write_to_file(output_file: str, inst: RandomInstance):
+def gen_inst_batched(card_m: int,  # pylint: disable=too-many-arguments
+                     card_n: int,
+                     prob: float,
+                     guarantee_sol: bool,
+                     include_sparse: bool = False,
+                     seed: Optional[int] = None,
+                     batch_rows: int = 1 << 16) -> RandomInstance:
+    """Generates an instance of the EC problem, like gen_inst but drawing the rows in batches.
+
+    All the rows are drawn at once (batch_rows at a time), and the rows are packed in bits
+    and hashed to find the duplicated ones. Only the duplicated and the empty rows are drawn
+    again, until there are none. The matrix is of uint8, to generate big instances.
+
+    Args:
+        card_m (int): The cardinality of set M.
+        card_n (int): The cardinality of set N.
+        prob (float): The probability of a bit to be 1. Must be between 0 and 1.
+        guarantee_sol (bool): True if the instance must have at least one solution.
+        include_sparse (bool): True if the instance must include a sparse matrix representation. (default: False)
+        seed (int, optional): The seed of the generator, the same seed gives the same instance.
+                              Defaults to None.
+        batch_rows (int, optional): Max number of rows drawn at once. Defaults to 65536.
+
+    Returns:
+        Inst: The generated instance.
+    """
+
+    if card_m <= 0 or card_n <= 0 or prob <= 0.0 or prob > 1:
+        raise ValueError('Invalid input')
+
+    # There are at most 2^M unique rows,
+    # so if N >= 2^M it is not possible to generate all different rows.
+    if card_n >= 2**card_m:
+        raise ValueError('N must be less than 2^M')
+
+    rng = np.random.default_rng(seed)
+    input_matrix = np.zeros((card_n, card_m), dtype=np.uint8)
+
+    # Same as gen_inst, the identity matrix is never drawn again.
+    start_index = 0
+    if guarantee_sol and card_m <= card_n:
+        start_index = card_m
+        input_matrix[0:card_m] = np.eye(card_m, dtype=np.uint8)
+
+    hashes = np.zeros(card_n, dtype=np.uint64)
+    hashes[:start_index] = __hash_rows(input_matrix[:start_index])
+
+    redraw = np.arange(start_index, card_n)
+    while len(redraw) > 0:
+        for first in range(0, len(redraw), batch_rows):
+            rows = redraw[first:first + batch_rows]
+            input_matrix[rows] = rng.random((len(rows), card_m)) < prob
+            hashes[rows] = __hash_rows(input_matrix[rows])
+
+        # The first row with every hash is kept, so the identity matrix is always kept.
+        duplicated = np.ones(card_n, dtype=bool)
+        duplicated[np.unique(hashes, return_index=True)[1]] = False
+        duplicated[:start_index] = False
+        empty = np.zeros(card_n, dtype=bool)
+        empty[redraw] = ~input_matrix[redraw].any(axis=1)
+        redraw = np.flatnonzero(duplicated | empty)
+
+    fixed_zero_col = False
+    # Same as gen_inst, a random row is chosen for every empty column.
+    empty_idxs = np.flatnonzero(~input_matrix.any(axis=0))
+    if empty_idxs.size > 0:
+        fixed_zero_col = True
+        input_matrix[rng.integers(card_n, size=empty_idxs.size), empty_idxs] = 1
+
+    return RandomInstance(input_matrix=input_matrix,
+                          input_matrix_sparse=sparse.csr_matrix(
+                              input_matrix) if include_sparse else None,
+                          prob=prob,
+                          guarantee_sol=guarantee_sol,
+                          fixed_zero_col=fixed_zero_col)
+
+
+def write_to_file(output_file: str, inst: RandomInstance, use_binary: bool = False):
     """Writes an instance to a file.
 
     Args:
         output_file (str): The file where to write the instance.
         inst (Inst): The instance to write.
+        use_binary (bool, optional): Write the instance in the binary format. Defaults to False.
     """
 
+    comments = ['Exact-Cover (Random)',
+                f'Generated at: {inst.gen_at}',
+                f'Cardinality of M: {str(inst.input_matrix.shape[1])}',
+                f'Cardinality of N: {str(inst.input_matrix.shape[0])}',
+                f'Probability: {str(inst.prob)}',
+                f'Guarantee solution: {str(inst.guarantee_sol)}',
+                f'Fixed zero col: {str(inst.fixed_zero_col)}']
+
+    if use_binary:
+        binary.write_binary(output_file, inst.input_matrix, comments=comments)
+        return
+
     with open(output_file, 'w', encoding="utf-8") as file:
-        file.write(';;; Exact-Cover (Random)\n')
-        file.write(f';;; Generated at: {inst.gen_at}\n')
-        file.write(
-            f';;; Cardinality of M: {str(inst.input_matrix.shape[1])}\n')
-        file.write(
-            f';;; Cardinality of N: {str(inst.input_matrix.shape[0])}\n')
-        file.write(f';;; Probability: {str(inst.prob)}\n')
-        file.write(f';;; Guarantee solution: {str(inst.guarantee_sol)}\n')
-        file.write(f';;; Fixed zero col: {str(inst.fixed_zero_col)}')
-
-        for row in inst.input_matrix:
-            file.write(f'\n{np.array2string(row)[1:-1]} -')
+        file.write('\n'.join(f';;; {comment}' for comment in comments))
+
+        # The rows are written a batch at a time, as '\n0 1 0 -'.
+        card_n, card_m = inst.input_matrix.shape
+        for first in range(0, card_n, 1 << 16):
+            rows = inst.input_matrix[first:first + (1 << 16)]
+            lines = np.full((len(rows), 2 * card_m + 2), ord(' '), dtype=np.uint8)
+            lines[:, 0] = ord('\n')
+            lines[:, 1:2 * card_m:2] = rows + ord('0')
+            lines[:, -1] = ord('-')
+            file.write(lines.tobytes().decode())
+
+
+def __hash_rows(rows: np.ndarray) -> np.ndarray:
+    # The rows packed in bits, 64 at a time, and mixed with the finalizer of splitmix64.
+    # Up to 64 columns the hash is the packed row itself, so it has no collisions.
+    packed = np.packbits(rows.astype(bool), axis=1, bitorder='little')
+    packed = np.pad(packed, ((0, 0), (0, -packed.shape[1] % 8)))
+    words = packed.view('<u8')
+
+    hashes = words[:, 0].copy()
+    for word in words.T[1:]:
+        hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+        hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+        hashes ^= (hashes >> np.uint64(31)) ^ word
+    return hashes
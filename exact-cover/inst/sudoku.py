@@ -9,6 +9,7 @@ import random
 from typing import Optional
 import numpy as np
 from scipy import sparse
+import binary
 
 
 @dataclass
@@ -173,23 +174,28 @@ def __set_constraint_row(puzzle: 'Sudoku',
     constraints[con_row][box_con_col] = 1
 
 
-def write_to_file(output_file: str, inst: SudokuInstance):
+def write_to_file(output_file: str, inst: SudokuInstance, use_binary: bool = False):
     """Writes an instance to a file.
 
     Args:
         output_file (str): The file where to write the instance.
         inst (Inst): The instance to write.
+        use_binary (bool, optional): Write the instance in the binary format. Defaults to False.
     """
 
+    comments = ['Exact-Cover (Sudoku)',
+                f'Generated at: {inst.gen_at}',
+                f'Dimension: {inst.dim}',
+                f'Difficulty: {inst.difficulty}',
+                'Sudoku puzzle: ',
+                *sudoku2str(inst.sudoku).split('\n')]
+
+    if use_binary:
+        binary.write_binary(output_file, inst.input_matrix, True, inst.dim, comments)
+        return
+
     with open(output_file, 'w', encoding="utf-8") as file:
-        file.write(';;; Exact-Cover (Sudoku)\n')
-        file.write(f';;; Generated at: {inst.gen_at}\n')
-        file.write(
-            f';;; Dimension: {inst.dim}\n')
-        file.write(
-            f';;; Difficulty: {inst.difficulty}\n')
-        file.write(
-            f';;; Sudoku puzzle: \n{sudoku2str(inst.sudoku, pre=";;; ")}')
+        file.write('\n'.join(f';;; {comment}' for comment in comments))
 
         for row in inst.input_matrix:
             file.write(
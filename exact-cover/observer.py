@@ -0,0 +1,218 @@
+"""observer.py
+Observers of the search tree explored by the EC algorithm.
+"""
+
+from datetime import timedelta
+import sys
+import time
+from typing import List, Optional, TextIO
+
+
+class SearchObserver:
+    """Receives the events of the search, to be extended by the observers.
+    The depth of a node is the number of rows in its set.
+
+    The methods do nothing, so an observer only overrides the events it needs.
+    Without an observer the algorithm does not call them at all.
+    """
+
+    def on_node(self, depth: int, count: int = 1):
+        """Called when nodes are visited.
+
+        Args:
+            depth (int): The depth of the nodes.
+            count (int, optional): The number of nodes visited. Defaults to 1.
+        """
+
+    def on_branch(self, depth: int, candidates: int):
+        """Called when the search goes down the subtree of a node.
+
+        Args:
+            depth (int): The depth of the node.
+            candidates (int): The number of rows that can extend its set,
+                              ie the number of children of the node.
+        """
+
+    def on_coverage(self, depth: int):
+        """Called when an exact coverage is found.
+
+        Args:
+            depth (int): The depth of the node, ie the number of rows of the coverage.
+        """
+
+    def summary(self) -> Optional[dict]:
+        """Returns the statistics collected by the observer, if any.
+
+        Returns:
+            dict: The statistics, that can be written as JSON. None if there are none.
+        """
+        return None
+
+
+class TreeStats(SearchObserver):
+    """Collects the statistics of the search tree:
+    - the nodes and the coverages per depth;
+    - the distribution of the branching factor, ie of the children of the nodes
+      whose subtree is explored (the other nodes are leaves);
+    - the time to the first coverage;
+    - the nodes per second over time, sampled every sample_nodes nodes.
+
+    The times are measured from the creation of the observer,
+    so the same observer can collect the statistics of several searches.
+    """
+
+    def __init__(self, sample_nodes: int = 1 << 16):
+        self.__sample_nodes = sample_nodes
+        self.__start_time = time.monotonic()
+
+        self.nodes_per_depth = []
+        self.coverages_per_depth = []
+        self.branching = {}
+        self.first_coverage_time: Optional[float] = None
+        self.nodes_per_second = []
+
+        self.__nodes = 0
+        self.__next_sample = sample_nodes
+        self.__last_sample = (0.0, 0)
+
+    def on_node(self, depth: int, count: int = 1):
+        if depth >= len(self.nodes_per_depth):
+            self.nodes_per_depth += [0] * (depth + 1 - len(self.nodes_per_depth))
+        self.nodes_per_depth[depth] += count
+
+        self.__nodes += count
+        if self.__nodes >= self.__next_sample:
+            self.__sample()
+
+    def on_branch(self, depth: int, candidates: int):
+        self.branching[candidates] = self.branching.get(candidates, 0) + 1
+
+    def on_coverage(self, depth: int):
+        if self.first_coverage_time is None:
+            self.first_coverage_time = self.__elapsed()
+
+        if depth >= len(self.coverages_per_depth):
+            self.coverages_per_depth += [0] * (depth + 1 - len(self.coverages_per_depth))
+        self.coverages_per_depth[depth] += 1
+
+    def summary(self) -> Optional[dict]:
+        return {
+            'nodes_per_depth': self.nodes_per_depth,
+            'coverages_per_depth': self.coverages_per_depth,
+            'branching': {str(k): v for k, v in sorted(self.branching.items())},
+            'first_coverage_time': self.first_coverage_time,
+            'nodes_per_second': self.nodes_per_second,
+        }
+
+    def __sample(self):
+        # The rate of the nodes visited since the previous sample.
+        elapsed = self.__elapsed()
+        last_elapsed, last_nodes = self.__last_sample
+        rate = (self.__nodes - last_nodes) / max(elapsed - last_elapsed, 1e-9)
+        self.nodes_per_second.append([round(elapsed, 3), self.__nodes, round(rate)])
+
+        self.__last_sample = (elapsed, self.__nodes)
+        self.__next_sample = self.__nodes + self.__sample_nodes
+
+    def __elapsed(self) -> float:
+        return time.monotonic() - self.__start_time
+
+
+class ProgressReporter(SearchObserver):
+    """Prints the progress of the search every interval seconds:
+    the nodes visited and the nodes per second, the coverages found and,
+    if the size of the tree is expected (eg from estimate_tree), the time left.
+    The time left is only as good as the estimate, which on irregular trees
+    can be off by an order of magnitude: its standard error is printed with it.
+
+    The time is read only every check_nodes nodes, and measured from the first node,
+    so that the rate does not count the time spent estimating the tree.
+    """
+
+    def __init__(self,
+                 interval: float = 5.0,
+                 check_nodes: int = 4096,
+                 file: TextIO = sys.stderr):
+        self.__interval = interval
+        self.__check_nodes = check_nodes
+        self.__file = file
+        self.__start_time = None
+        self.__next_report = None
+
+        self.nodes = 0
+        self.coverages = 0
+        self.expected_nodes = 0.0
+        self.expected_error = 0.0
+
+        self.__next_check = check_nodes
+
+    def expect(self, nodes: float, error: float = 0.0):
+        """Adds nodes to the expected size of the tree,
+        eg for every search when there are many.
+
+        Args:
+            nodes (float): The number of nodes expected.
+            error (float, optional): The standard error of nodes. Defaults to 0.0.
+        """
+        self.expected_nodes += nodes
+        # The estimates are independent, so their variances add up.
+        self.expected_error = (self.expected_error ** 2 + error ** 2) ** 0.5
+
+    def on_node(self, depth: int, count: int = 1):
+        if self.__start_time is None:
+            self.__start_time = time.monotonic()
+            self.__next_report = self.__start_time + self.__interval
+
+        self.nodes += count
+        if self.nodes >= self.__next_check:
+            self.__next_check = self.nodes + self.__check_nodes
+            if time.monotonic() >= self.__next_report:
+                self.report()
+
+    def on_coverage(self, depth: int):
+        self.coverages += 1
+
+    def report(self):
+        """Prints the progress of the search."""
+        now = time.monotonic()
+        rate = self.nodes / max(now - (self.__start_time or now), 1e-9)
+
+        line = f'Nodes visited: {self.nodes} ({rate:.0f}/s), coverages found: {self.coverages}'
+        if self.expected_nodes > 0:
+            # The estimate can be exceeded, then the time left is unknown.
+            left = self.expected_nodes - self.nodes
+            eta = str(timedelta(seconds=round(left / rate))) if left > 0 and rate > 0 else '?'
+            line += f', estimated nodes: {self.expected_nodes:.4g} ' \
+                f'(standard error: {self.expected_error:.2g}), estimated ETA: {eta}'
+
+        print(line, file=self.__file, flush=True)
+        self.__next_report = now + self.__interval
+
+
+class ObserverGroup(SearchObserver):
+    """Sends the events of the search to many observers.
+    The summary is the union of their summaries.
+    """
+
+    def __init__(self, observers: List[SearchObserver]):
+        self.__observers = observers
+
+    def on_node(self, depth: int, count: int = 1):
+        for observer in self.__observers:
+            observer.on_node(depth, count)
+
+    def on_branch(self, depth: int, candidates: int):
+        for observer in self.__observers:
+            observer.on_branch(depth, candidates)
+
+    def on_coverage(self, depth: int):
+        for observer in self.__observers:
+            observer.on_coverage(depth)
+
+    def summary(self) -> Optional[dict]:
+        summaries = [observer.summary() for observer in self.__observers]
+        summaries = [summary for summary in summaries if summary is not None]
+        if not summaries:
+            return None
+
+        return {key: value for summary in summaries for key, value in summary.items()}
@@ -0,0 +1,129 @@
+"""order.py
+Heuristics for the order of the rows visited by EC, and mapping of the coverages back.
+"""
+
+import dataclasses
+from typing import Iterator
+import numpy as np
+from ec import Result
+from input_matrix import InputMatrix
+
+# The available orders, the first one leaves the rows as they are.
+ORDERS = ['input', 'cardinality', 'rarest', 'degree']
+
+
+def row_order(input_matrix: InputMatrix, order: str) -> np.ndarray:
+    """Computes a permutation of the rows of the input matrix.
+    EC extends a set with the rows of lower index, so the rows to try first
+    get the highest indexes, except for the empty rows that get the highest of all:
+    EC skips them at the root and never tries them to extend another row.
+    Without pruning the order of the other rows does not change the nodes visited,
+    so no order visits more nodes than input.
+
+    Args:
+        input_matrix (InputMatrix): The input matrix.
+        order (str): One of ORDERS:
+                     - input: the rows as they are;
+                     - cardinality: the rows with more elements first;
+                     - rarest: the rows covering the columns with fewer rows first,
+                       then the ones with more elements;
+                     - degree: the rows compatible with fewer rows first,
+                       ie with the lowest degree in the compatibility graph.
+
+    Returns:
+        np.ndarray: The original index of every row, in the new order.
+    """
+    rows = input_matrix.to_sparse().tocsr()
+    n, m = rows.shape
+    card = np.diff(rows.indptr)
+
+    if order == 'input':
+        return np.arange(n)
+
+    # The rows in the order in which they should be tried.
+    if order == 'cardinality':
+        priority = np.argsort(-card, kind='stable')
+    elif order == 'rarest':
+        per_col = np.bincount(rows.indices, minlength=m)
+        rarity = np.full(n, np.iinfo(per_col.dtype).max, dtype=per_col.dtype)
+        for i in range(n):
+            cols = rows.indices[rows.indptr[i]:rows.indptr[i + 1]]
+            if len(cols) > 0:
+                rarity[i] = per_col[cols].min()
+        priority = np.lexsort((-card, rarity))
+    elif order == 'degree':
+        # The rows disjoint from a row are the zeros of its row in A * A^T.
+        overlaps = (rows.astype(np.int32) @ rows.T.astype(np.int32)).tocsr()
+        overlaps.eliminate_zeros()
+        degree = n - np.diff(overlaps.indptr)
+        priority = np.argsort(degree, kind='stable')
+    else:
+        raise ValueError(f"Unknown row order: {order}")
+
+    # Only the rows that are not empty are reversed, the empty ones go last.
+    nonempty = priority[card[priority] > 0]
+    return np.concatenate((nonempty[::-1], np.flatnonzero(card == 0)))
+
+
+class Ordered:
+    """Runs an algorithm on the instance with the rows permuted,
+    returning the coverages with the indexes of the original rows.
+
+    The algorithm must be built on permute(input_matrix, rows).
+    """
+
+    def __init__(self, rows: np.ndarray, alg, order: str):
+        self.__rows = rows
+        self.__alg = alg
+        self.__order = order
+
+        # COV
+        self._coverages = []
+
+    @staticmethod
+    def permute(input_matrix: InputMatrix, rows: np.ndarray) -> InputMatrix:
+        """Permutes the rows of an input matrix.
+
+        Args:
+            input_matrix (InputMatrix): The input matrix.
+            rows (np.ndarray): The original index of every row, in the new order.
+
+        Returns:
+            InputMatrix: The permuted matrix, with the same representation.
+        """
+        return type(input_matrix)(input_matrix.to_sparse().tocsr()[rows].toarray())
+
+    def stop(self):
+        """Stop the algorithm."""
+        self.__alg.stop()
+
+    def load_checkpoint(self, checkpoint_file: str):
+        """Restores the state of a stopped search, see EC.load_checkpoint."""
+        self.__alg.load_checkpoint(checkpoint_file)
+
+    def start(self) -> Result:
+        """Start the algorithm."""
+        for coverage in self.iter_coverages():
+            self._coverages.append(coverage)
+
+        # Sort the coverages in the order in which EC would find them
+        # on the original instance.
+        self._coverages.sort(key=tuple)
+
+        return self.result()
+
+    def iter_coverages(self) -> Iterator[np.ndarray]:
+        """Start the algorithm, yielding every coverage as soon as it is found.
+
+        Yields:
+            np.ndarray: The indexes of the original rows of an exact coverage,
+                        in decreasing order as in EC.
+        """
+        for coverage in self.__alg.iter_coverages():
+            yield np.sort(self.__rows[coverage])[::-1]
+
+    def result(self) -> Result:
+        """Returns the result of the algorithm, with the coverages kept by start()."""
+        return dataclasses.replace(self.__alg.result(),
+                                   coverages=self._coverages,
+                                   order=self.__order)
@@ -0,0 +1,243 @@
+"""output.py
+Bulk formatting and parsing of the arrays in the output files, ie the sets and the coverages.
+"""
+
+import io
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Tuple
+import zipfile
+import numpy as np
+from scipy import sparse
+
+# The formats of the coverages in the output file.
+COVERAGE_FORMATS = ['text', 'binary', 'compressed']
+
+# Number of rows of the input matrix formatted at once.
+__BLOCK_ROWS = 4096
+
+
+def format_arrays(values: np.ndarray, lengths: np.ndarray) -> bytes:
+    """Formats many arrays of non negative integers at once,
+    one per line and as str(array) would, eg '[ 1  5 12]'.
+    Unlike str, the arrays are never wrapped or summarized.
+
+    Args:
+        values (np.ndarray): The values of all the arrays, one after the other.
+        lengths (np.ndarray): The length of every array.
+
+    Returns:
+        bytes: The arrays, every one followed by a new line.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if len(lengths) == 0:
+        return b''
+
+    # Every value is padded to the width of the biggest one of its array.
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    digits = np.ones(len(values), dtype=np.int64)
+    for power in range(1, len(str(values.max())) if len(values) > 0 else 1):
+        digits += values >= 10 ** power
+    widths = np.zeros(len(lengths), dtype=np.int64)
+    nonempty = lengths > 0
+    widths[nonempty] = np.maximum.reduceat(digits, starts[nonempty]) if len(values) > 0 else 0
+
+    line_lengths = np.maximum(lengths * (widths + 1), 1) + 2
+    line_starts = np.concatenate(([0], np.cumsum(line_lengths)[:-1]))
+    buffer = np.full(line_lengths.sum(), ord(' '), dtype=np.uint8)
+    buffer[line_starts] = ord('[')
+    buffer[line_starts + line_lengths - 2] = ord(']')
+    buffer[line_starts + line_lengths - 1] = ord('\n')
+
+    # The position of every value in its array, and the end of its last digit.
+    array = np.repeat(np.arange(len(lengths)), lengths)
+    position = np.arange(len(values)) - starts[array]
+    ends = line_starts[array] + position * (widths[array] + 1) + widths[array]
+    for power in range(digits.max() if len(values) > 0 else 0):
+        mask = digits > power
+        buffer[ends[mask] - power] = ord('0') + values[mask] // 10 ** power % 10
+
+    return buffer.tobytes()
+
+
+def parse_arrays(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Parses the arrays written by format_arrays, or with str, one per line.
+    The values before the first '[' are skipped.
+
+    Args:
+        data (bytes): The lines of the arrays.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The values of all the arrays and the length of every array.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    opens = np.flatnonzero(buffer == ord('['))
+
+    is_digit = (buffer >= ord('0')) & (buffer <= ord('9'))
+    edges = np.diff(np.concatenate(([False], is_digit, [False])).astype(np.int8))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    values = np.zeros(len(starts), dtype=np.int64)
+    for power in range((ends - starts).max() if len(starts) > 0 else 0):
+        mask = ends - starts > power
+        values[mask] += (buffer[ends[mask] - 1 - power].astype(np.int64) - ord('0')) * 10 ** power
+
+    array = np.searchsorted(opens, starts, side='right') - 1
+    values = values[array >= 0]
+    lengths = np.bincount(array[array >= 0], minlength=len(opens))
+
+    return values, lengths
+
+
+def iter_arrays(file: BinaryIO,
+                chunk_bytes: int = 1 << 22) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Parses the arrays of a file, one per line, a chunk of lines at a time,
+    so that the memory does not depend on the size of the file.
+
+    Args:
+        file (BinaryIO): The file, from its current position.
+        chunk_bytes (int, optional): Number of bytes read at once. Defaults to 4 MB.
+
+    Yields:
+        Tuple[np.ndarray, np.ndarray]: The values of the arrays in the chunk
+                                       and the length of every array, as parse_arrays.
+    """
+    # The chunks end at the end of a line, so that no array is split.
+    rest = b''
+    while True:
+        chunk = file.read(chunk_bytes)
+        if not chunk:
+            break
+
+        chunk = rest + chunk
+        end = chunk.rfind(b'\n') + 1
+        chunk, rest = chunk[:end], chunk[end:]
+        if chunk:
+            yield parse_arrays(chunk)
+
+    if rest:
+        yield parse_arrays(rest)
+
+
+def split_arrays(values: np.ndarray, lengths: np.ndarray) -> List[np.ndarray]:
+    """Splits the values of many arrays, eg from parse_arrays, in the single arrays.
+
+    Args:
+        values (np.ndarray): The values of all the arrays.
+        lengths (np.ndarray): The length of every array.
+
+    Returns:
+        List[np.ndarray]: The arrays.
+    """
+    return np.split(values, np.cumsum(lengths)[:-1]) if len(lengths) > 0 else []
+
+
+def join_arrays(arrays: Iterable[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Joins many arrays, the opposite of split_arrays.
+
+    Args:
+        arrays (Iterable[np.ndarray]): The arrays.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The values of all the arrays and the length of every array.
+    """
+    arrays = [np.asarray(array, dtype=np.int64) for array in arrays]
+    if not arrays:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    return np.concatenate(arrays), np.array([len(array) for array in arrays], dtype=np.int64)
+
+
+def write_sets(file: BinaryIO, rows: sparse.csr_matrix):
+    """Writes the rows of the input matrix as ';;; Set   1: [0 1 0]' lines,
+    a block of rows at a time.
+
+    Args:
+        file (BinaryIO): The output file.
+        rows (sparse.csr_matrix): The input matrix.
+    """
+    n, m = rows.shape
+    for first in range(0, n, __BLOCK_ROWS):
+        block = rows[first:first + __BLOCK_ROWS].toarray()
+        lines = format_arrays(block.ravel(), np.full(len(block), m)).splitlines(keepends=True)
+        file.write(b''.join(f';;; Set {first + idx + 1:>3}: '.encode() + line
+                            for idx, line in enumerate(lines)))
+
+
+def write_binary_coverages(file: BinaryIO,
+                           values: np.ndarray,
+                           lengths: np.ndarray,
+                           n_rows: int,
+                           compressed: bool = False):
+    """Writes the coverages as a NumPy .npz archive, with the arrays
+    'indptr' (the start of every coverage) and 'rows' (the 0-based rows of the coverages).
+
+    Args:
+        file (BinaryIO): The output file.
+        values (np.ndarray): The rows of all the coverages, 0-based.
+        lengths (np.ndarray): The number of rows of every coverage.
+        n_rows (int): The number of rows of the input matrix, to choose the type of 'rows'.
+        compressed (bool, optional): Compress the archive. Defaults to False.
+    """
+    write_binary_coverage_chunks(file, lambda: [(values, lengths)], n_rows, compressed)
+
+
+def write_binary_coverage_chunks(file: BinaryIO,
+                                 read_chunks: Callable[[], Iterable[Tuple[np.ndarray, np.ndarray]]],
+                                 n_rows: int,
+                                 compressed: bool = False):
+    """Writes the coverages as write_binary_coverages, a chunk at a time.
+    The chunks are read three times (to count the coverages, and for each array),
+    so the coverages are never all in memory.
+
+    Args:
+        file (BinaryIO): The output file.
+        read_chunks (Callable[[], Iterable[Tuple[np.ndarray, np.ndarray]]]): Returns a new
+            iterator on the chunks, every one with the 0-based rows of its coverages
+            and the number of rows of every coverage.
+        n_rows (int): The number of rows of the input matrix, to choose the type of 'rows'.
+        compressed (bool, optional): Compress the archive. Defaults to False.
+    """
+    dtype = np.dtype(np.uint16 if n_rows <= np.iinfo(np.uint16).max + 1 else np.uint32)
+
+    n_coverages = n_values = 0
+    for values, lengths in read_chunks():
+        n_coverages += len(lengths)
+        n_values += len(values)
+
+    # The same archive written by np.savez (or np.savez_compressed).
+    compression = zipfile.ZIP_DEFLATED if compressed else zipfile.ZIP_STORED
+    with zipfile.ZipFile(file, mode='w', compression=compression, allowZip64=True) as archive:
+        with archive.open('indptr.npy', mode='w', force_zip64=True) as member:
+            __write_npy_header(member, np.dtype(np.int64), n_coverages + 1)
+            last = np.zeros(1, dtype=np.int64)
+            member.write(last.tobytes())
+            for _, lengths in read_chunks():
+                ends = last[-1] + np.cumsum(lengths, dtype=np.int64)
+                member.write(ends.tobytes())
+                if len(ends) > 0:
+                    last = ends[-1:]
+
+        with archive.open('rows.npy', mode='w', force_zip64=True) as member:
+            __write_npy_header(member, dtype, n_values)
+            for values, _ in read_chunks():
+                member.write(np.asarray(values).astype(dtype).tobytes())
+
+
+def read_binary_coverages(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Reads the coverages written by write_binary_coverages.
+
+    Args:
+        data (bytes): The archive.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The rows of all the coverages, 0-based,
+                                       and the number of rows of every coverage.
+    """
+    with np.load(io.BytesIO(data)) as archive:
+        return archive['rows'].astype(np.int64), np.diff(archive['indptr'])
+
+
+def __write_npy_header(file: BinaryIO, dtype: np.dtype, count: int):
+    np.lib.format.write_array_header_1_0(file, {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                'fortran_order': False,
+                                                'shape': (count,)})
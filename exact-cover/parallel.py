@@ -0,0 +1,318 @@
+"""parallel.py
+Parallel version of the EC and EC plus algorithms, running on a process pool.
+"""
+
+from multiprocessing import Pool, shared_memory
+import os
+import queue
+import signal
+import time
+from typing import Iterator, Optional
+import numpy as np
+from compat_matrix import CompatMatrix
+from ec import EC, ECPlus, Result
+from input_matrix import InputMatrix
+
+# State of a worker process, set up by __init_worker.
+_worker = {}
+
+
+class ParallelEC:  # pylint: disable=too-many-instance-attributes
+    """EC (or EC plus) running on a pool of worker processes.
+
+    The search is split in two phases:
+    1. the columns of B are computed by the workers, a few rows i at a time;
+    2. the subtrees of every compatible pair (i, j) are explored by the workers.
+       A worker stops after task_nodes nodes and sends back the rows it did not try,
+       which become new tasks: big subtrees are split as they are found,
+       while small ones are completed in a single task.
+
+    The input matrix and B are sent to the workers once, through shared memory.
+    Only the dense input matrix is read in place: the sparse and bitset ones,
+    and B, whose columns are python ints, are unpacked by every worker in its own copy
+    (B takes n^2 / 8 bytes per worker).
+    The merged result has the same coverages (in the same order)
+    and the same visited nodes as the serial algorithm.
+    The execution time, and so time_limit, is the wall clock time,
+    as the work is done by the workers, while the serial algorithm
+    uses the CPU time of its process.
+    With max_coverages, the tasks already sent when the limit is reached are completed,
+    but only the first max_coverages coverages received are kept.
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 input_matrix: InputMatrix,
+                 time_limit: float = -1,
+                 plus: bool = False,
+                 workers: Optional[int] = None,
+                 task_nodes: int = 20000,
+                 count_only: bool = False,
+                 max_coverages: int = -1):
+        # Check if the input matrix is valid
+        if not input_matrix.is_valid():
+            raise ValueError("Input matrix is not valid")
+
+        self._input_matrix = input_matrix
+        self._n, self._m = input_matrix.shape
+        self.__plus = plus
+        self.__workers = workers if workers is not None else os.cpu_count()
+        self.__task_nodes = task_nodes
+        self.__count_only = count_only
+
+        # B
+        self._compat_matrix = CompatMatrix(self._n)
+
+        # COV
+        self._coverages = []
+
+        self.__time_limit = time_limit
+        self.__max_coverages = max_coverages
+        self.__start_time = time.perf_counter()
+
+        # Flag for stopping the algorithm, and the reason why the search stopped,
+        # set when it stops so that result() does not depend on when it is called.
+        self.__stop_flag = False
+        self.__stop_reason = None
+
+        # Node statistics.
+        self._visited_nodes = 0
+        self._coverage_count = 0
+
+    def stop(self):
+        """Stop the algorithm."""
+        self.__stop_flag = True
+
+    def start(self) -> Result:
+        """Start the algorithm."""
+        for coverage in self.iter_coverages():
+            self._coverages.append(coverage)
+
+        # Sort the coverages in the order in which the serial algorithm finds them.
+        self._coverages.sort(key=tuple)
+
+        return self.result()
+
+    def iter_coverages(self) -> Iterator[np.ndarray]:
+        """Start the algorithm, yielding the coverages as soon as the workers send them.
+        The coverages are not kept by the algorithm:
+        when the iteration is over, result() returns the statistics of the search.
+
+        Yields:
+            np.ndarray: The indexes of the rows of an exact coverage.
+                        Nothing is yielded with count_only.
+        """
+        rows_shm = shared_memory.SharedMemory(
+            create=True, size=max(1, self._n * self._m))
+        compat_shm = shared_memory.SharedMemory(
+            create=True, size=max(1, int(np.prod(self._compat_matrix.buffer_shape()))))
+
+        try:
+            rows = np.ndarray(self._input_matrix.shape,
+                              dtype=np.uint8, buffer=rows_shm.buf)
+            for i, row in enumerate(self._input_matrix):
+                rows[i] = row
+
+            with Pool(self.__workers,
+                      initializer=_init_worker,
+                      initargs=(rows_shm.name, compat_shm.name,
+                                self._input_matrix.shape,
+                                self._compat_matrix.buffer_shape(),
+                                type(self._input_matrix),
+                                self.__plus, self.__task_nodes,
+                                self.__count_only)) as pool:
+                yield from self.__build_compat_matrix(pool)
+
+                if not self.__should_stop():
+                    compat = np.ndarray(self._compat_matrix.buffer_shape(),
+                                        dtype=np.uint8, buffer=compat_shm.buf)
+                    self._compat_matrix.to_buffer(compat)
+                    yield from self.__explore_subtrees(pool)
+        finally:
+            rows_shm.close()
+            rows_shm.unlink()
+            compat_shm.close()
+            compat_shm.unlink()
+
+    def result(self) -> Result:
+        """Returns the result of the algorithm, with the coverages kept by start()."""
+        return Result(coverages=self._coverages,
+                      visited_nodes=self._visited_nodes,
+                      total_nodes=(2**self._n)-1,
+                      execution_time=self.__execution_time(),
+                      stopped=self.__stop_flag,
+                      time_limit_reached=self.__stop_reason == 'time',
+                      plus=self.__plus,
+                      coverage_count=self._coverage_count,
+                      coverage_limit_reached=self.__coverage_limit_reached(),
+                      count_only=self.__count_only,
+                      stop_reason=self.__stop_reason)
+
+    def __build_compat_matrix(self, pool) -> Iterator[np.ndarray]:
+        chunksize = max(1, self._n // (self.__workers * 16))
+        for i, visited_nodes, coverages, coverage_count, column in pool.imap_unordered(
+                _build_column, range(self._n), chunksize):
+            self._visited_nodes += visited_nodes
+            self._compat_matrix.set_column(i, column)
+            yield from self.__add_coverages(coverages, coverage_count)
+
+            if self.__should_stop():
+                pool.terminate()
+                return
+
+    def __explore_subtrees(self, pool) -> Iterator[np.ndarray]:
+        results = queue.SimpleQueue()
+        roots = self.__root_tasks()
+        frontier = []
+        in_flight = 0
+
+        while True:
+            # Keep every worker busy, preferring the subtrees split by the workers
+            # so that the number of pending tasks stays small.
+            while in_flight < 2 * self.__workers and not self.__should_stop():
+                task = frontier.pop() if frontier else next(roots, None)
+                if task is None:
+                    break
+
+                pool.apply_async(_explore, task,
+                                 callback=results.put, error_callback=results.put)
+                in_flight += 1
+
+            if in_flight == 0:
+                return
+
+            try:
+                result = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            in_flight -= 1
+            if isinstance(result, BaseException):
+                raise result
+
+            coverages, coverage_count, visited_nodes, subtrees = result
+            self._visited_nodes += visited_nodes
+            frontier.extend(subtrees)
+            yield from self.__add_coverages(coverages, coverage_count)
+
+    def __add_coverages(self, coverages: list, coverage_count: int) -> Iterator[np.ndarray]:
+        # The coverages received after the limit is reached are discarded.
+        if self.__max_coverages >= 0:
+            coverage_count = min(coverage_count,
+                                 self.__max_coverages - self._coverage_count)
+
+        self._coverage_count += coverage_count
+        yield from coverages[:coverage_count]
+
+    def __root_tasks(self) -> Iterator[tuple]:
+        # The subtrees of the compatible pairs (i, j),
+        # as in the inner loop of EC.start.
+        for i in range(self._n):
+            column = self._compat_matrix.column(i)
+            while column:
+                low = column & -column
+                j = low.bit_length() - 1
+                column ^= low
+
+                inter = self._compat_matrix.column(i, j) \
+                    & self._compat_matrix.column(j)
+                if inter != 0:
+                    yield [i, j], inter, None, 0
+
+    def __execution_time(self) -> float:
+        return time.perf_counter() - self.__start_time
+
+    def __time_limit_reached(self) -> bool:
+        if self.__time_limit < 0:
+            return False
+
+        return self.__execution_time() > self.__time_limit
+
+    def __coverage_limit_reached(self) -> bool:
+        return 0 <= self.__max_coverages <= self._coverage_count
+
+    def __should_stop(self) -> bool:
+        # Once a budget is over, the search stops for good.
+        if self.__stop_reason is not None:
+            return True
+
+        if self.__stop_flag:
+            self.__stop_reason = 'stopped'
+        elif self.__coverage_limit_reached():
+            self.__stop_reason = 'coverages'
+        elif self.__time_limit_reached():
+            self.__stop_reason = 'time'
+
+        return self.__stop_reason is not None
+
+
+def _init_worker(rows_name: str,  # pylint: disable=too-many-arguments
+                 compat_name: str,
+                 shape: tuple,
+                 compat_shape: tuple,
+                 matrix_type: type,
+                 plus: bool,
+                 task_nodes: int,
+                 count_only: bool):
+    # The main process handles the interruption and stops sending tasks.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # The shared memory is owned (and unlinked) by the main process.
+    rows_shm = shared_memory.SharedMemory(name=rows_name)
+    compat_shm = shared_memory.SharedMemory(name=compat_name)
+
+    rows = np.ndarray(shape, dtype=np.uint8, buffer=rows_shm.buf)
+    input_matrix = matrix_type(rows)
+
+    _worker.update(rows_shm=rows_shm,
+                   compat_shm=compat_shm,
+                   compat_shape=compat_shape,
+                   input_matrix=input_matrix,
+                   card=input_matrix.nonzero_per_row(),
+                   plus=plus,
+                   task_nodes=task_nodes,
+                   count_only=count_only,
+                   alg=None)
+
+
+def _build_column(i: int):
+    # Same as one iteration of the outer loop of EC.start, without the exploration.
+    input_matrix = _worker['input_matrix']
+    card = _worker['card']
+    _, m = input_matrix.shape
+
+    if input_matrix.row_empty(i):
+        return i, 1, [], 0, 0
+
+    if input_matrix.row_full(i):
+        return i, 1, [] if _worker['count_only'] else [np.array([i])], 1, 0
+
+    coverages = []
+    coverage_count = 0
+    column = 0
+    for j in range(i):
+        _, nnz_inter = input_matrix.rows_intersection(i, j)
+        if nnz_inter == 0:
+            # The rows are disjoint, so the union has card[i] + card[j] elements.
+            if card[i] + card[j] == m:
+                coverage_count += 1
+                if not _worker['count_only']:
+                    coverages.append(np.array([i, j]))
+            else:
+                column |= 1 << j
+
+    return i, i + 1, coverages, coverage_count, column
+
+
+def _explore(indexes: list, inter: int, union_value, first: int):
+    # B is written to the shared memory only after the first phase,
+    # so it is read at the first exploration, into a copy of the worker.
+    if _worker['alg'] is None:
+        buffer = np.ndarray(_worker['compat_shape'],
+                            dtype=np.uint8, buffer=_worker['compat_shm'].buf)
+        alg_type = ECPlus if _worker['plus'] else EC
+        _worker['alg'] = alg_type(_worker['input_matrix'],
+                                  compat_matrix=CompatMatrix.from_buffer(buffer),
+                                  count_only=_worker['count_only'])
+
+    return _worker['alg'].explore(indexes, inter, union_value, first,
+                                  max_nodes=_worker['task_nodes'])
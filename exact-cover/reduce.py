@@ -0,0 +1,223 @@
+"""reduce.py
+Reduction of an instance before the search, and mapping of the coverages back.
+"""
+
+import dataclasses
+import itertools
+import time
+from typing import Iterator, Optional
+import numpy as np
+from ec import Result
+from input_matrix import InputMatrix
+
+
+class Reduction:  # pylint: disable=too-many-instance-attributes
+    """Reduces an instance of the exact cover problem.
+
+    The reduction:
+    1. drops the empty rows, that can never be part of a coverage;
+    2. keeps only the first of the rows that are equal,
+       as every coverage using one of them has a copy using each of the others;
+    3. forces the rows that are the only ones covering some column,
+       as they are in every coverage, and drops the rows that intersect them;
+    4. finds early that the instance has no coverage,
+       if some column cannot be covered by any row left.
+
+    The reduced instance has the rows and columns left, in the same order,
+    and expand maps its coverages back to the rows of the original instance.
+    """
+
+    def __init__(self, input_matrix: InputMatrix):
+        start_time = time.process_time()
+
+        rows = np.array(list(input_matrix), dtype=bool, ndmin=2)
+        self._n, self._m = rows.shape
+        alive_rows = rows.any(axis=1)
+        alive_cols = np.ones(self._m, dtype=bool)
+        empty_rows = self._n - int(np.count_nonzero(alive_rows))
+
+        # Every row kept stands for all the rows equal to it.
+        _, first, inverse = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+        first = first[np.ravel(inverse)]
+        duplicate = first != np.arange(self._n)
+        self.__copies = {}
+        for i in np.flatnonzero(duplicate & alive_rows):
+            self.__copies.setdefault(first[i], [first[i]]).append(i)
+        duplicate_rows = int(np.count_nonzero(duplicate & alive_rows))
+        alive_rows &= ~duplicate
+
+        # Force the rows that are the only ones covering a column,
+        # until there are none left or a column cannot be covered.
+        self.__forced = []
+        conflicting_rows = 0
+        self.infeasible = False
+        while alive_cols.any():
+            per_col = np.count_nonzero(rows[alive_rows][:, alive_cols], axis=0)
+            if per_col.min() == 0:
+                self.infeasible = True
+                break
+
+            singles = np.flatnonzero(per_col == 1)
+            if len(singles) == 0:
+                break
+
+            col = np.flatnonzero(alive_cols)[singles[0]]
+            row = np.flatnonzero(alive_rows & rows[:, col])[0]
+            self.__forced.append(row)
+
+            conflicting = alive_rows & rows[:, rows[row]].any(axis=1)
+            conflicting_rows += int(np.count_nonzero(conflicting)) - 1
+            alive_rows &= ~conflicting
+            alive_cols &= ~rows[row]
+
+        # Original index of every row of the reduced instance.
+        self.__rows = np.flatnonzero(alive_rows)
+
+        self.input_matrix: Optional[InputMatrix] = None
+        if not self.infeasible and alive_cols.any():
+            self.input_matrix = type(input_matrix)(
+                rows[alive_rows][:, alive_cols].astype(int))
+
+        self.stats = {
+            'rows': self._n,
+            'columns': self._m,
+            'reduced rows': len(self.__rows) if self.input_matrix is not None else 0,
+            'reduced columns': int(np.count_nonzero(alive_cols)) if not self.infeasible else 0,
+            'empty rows': empty_rows,
+            'duplicate rows': duplicate_rows,
+            'forced rows': len(self.__forced),
+            'conflicting rows': conflicting_rows,
+            'infeasible': self.infeasible,
+        }
+        self.execution_time = time.process_time() - start_time
+
+    def has_copies(self) -> bool:
+        """Check if some rows were dropped as copies of others,
+        ie if a coverage of the reduced instance can expand to more than one.
+
+        Returns:
+            bool: True if there are copies, False otherwise.
+        """
+        return len(self.__copies) > 0
+
+    def expand(self, coverage: Optional[np.ndarray] = None) -> Iterator[np.ndarray]:
+        """Maps a coverage of the reduced instance to the original instance.
+
+        Args:
+            coverage (np.ndarray, optional): The indexes of the rows in the reduced instance.
+                                             None if the reduced instance is empty.
+
+        Yields:
+            np.ndarray: The coverages of the original instance, with the indexes
+                        in decreasing order as in EC.
+        """
+        rows = list(self.__forced)
+        if coverage is not None:
+            rows += list(self.__rows[coverage])
+
+        choices = [self.__copies.get(row, [row]) for row in rows]
+        for choice in itertools.product(*choices):
+            yield np.array(sorted(choice, reverse=True))
+
+
+class Reduced:  # pylint: disable=too-many-instance-attributes
+    """Runs an algorithm on a reduced instance, returning the coverages
+    of the original instance.
+
+    The algorithm must be built on the reduced input matrix,
+    and can be None if it is empty (ie the forced rows are the only coverage)
+    or if the instance is infeasible. It can be built with the same max_coverages,
+    as every coverage of the reduced instance is at least one of the original one.
+    If the reduction has copies, the algorithm must list its coverages
+    even with count_only, as they are expanded to be counted.
+    """
+
+    def __init__(self,
+                 reduction: Reduction,
+                 alg=None,
+                 count_only: bool = False,
+                 max_coverages: int = -1):
+        self.__reduction = reduction
+        self.__alg = alg
+        self.__count_only = count_only
+        self.__max_coverages = max_coverages
+
+        # COV
+        self._coverages = []
+        self._coverage_count = 0
+
+        # Flag for stopping the algorithm.
+        self.__stop_flag = False
+
+    def stop(self):
+        """Stop the algorithm."""
+        self.__stop_flag = True
+        if self.__alg is not None:
+            self.__alg.stop()
+
+    def start(self) -> Result:
+        """Start the algorithm."""
+        for coverage in self.iter_coverages():
+            self._coverages.append(coverage)
+
+        return self.result()
+
+    def iter_coverages(self) -> Iterator[np.ndarray]:
+        """Start the algorithm, yielding every coverage of the original instance
+        as soon as it is found.
+
+        Yields:
+            np.ndarray: The indexes of the rows of an exact coverage.
+                        Nothing is yielded with count_only.
+        """
+        if self.__reduction.infeasible:
+            return
+
+        if self.__coverage_limit_reached():
+            return
+
+        if self.__alg is None:
+            coverages = [None]
+        else:
+            coverages = self.__alg.iter_coverages()
+
+        for coverage in coverages:
+            for expanded in self.__reduction.expand(coverage):
+                self._coverage_count += 1
+                # The search is stopped as soon as the last coverage is found,
+                # and not when looking for the next one.
+                if self.__coverage_limit_reached():
+                    self.stop()
+                if not self.__count_only:
+                    yield expanded
+                if self.__coverage_limit_reached():
+                    return
+
+    def result(self) -> Result:
+        """Returns the result of the algorithm, with the coverages kept by start()."""
+        n = self.__reduction.stats['rows']
+        result = Result(coverages=[], visited_nodes=0, total_nodes=0,
+                        execution_time=0, stopped=False, time_limit_reached=False)
+        if self.__alg is not None:
+            result = self.__alg.result()
+
+        # Without copies, a counting algorithm has the exact count.
+        coverage_count = self._coverage_count
+        if result.count_only and not self.__reduction.has_copies():
+            coverage_count = result.coverage_count
+
+        return dataclasses.replace(
+            result,
+            coverages=self._coverages,
+            total_nodes=(2**n)-1,
+            execution_time=self.__reduction.execution_time + result.execution_time,
+            stopped=self.__stop_flag and not self.__coverage_limit_reached(),
+            coverage_count=coverage_count,
+            coverage_limit_reached=self.__coverage_limit_reached()
+            or result.coverage_limit_reached,
+            count_only=self.__count_only,
+            reduction=self.__reduction.stats,
+            stop_reason='coverages' if self.__coverage_limit_reached() else result.stop_reason)
+
+    def __coverage_limit_reached(self) -> bool:
+        return 0 <= self.__max_coverages <= self._coverage_count
@@ -0,0 +1,53 @@
+"""test_components.py
+Checks that ec --decompose with --max-solutions stops as soon as enough coverages are found.
+"""
+
+import math
+import os
+import sys
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'exact-cover'))
+
+import components  # pylint: disable=wrong-import-position
+import ec  # pylint: disable=wrong-import-position
+from input_matrix import DenseInputMatrix  # pylint: disable=wrong-import-position
+
+# Two components: columns 0-1 with 2 coverages, and columns 2-5 with many more.
+MATRIX = np.array([
+    [1, 0, 0, 0, 0, 0],
+    [0, 1, 0, 0, 0, 0],
+    [1, 1, 0, 0, 0, 0],
+    [0, 0, 1, 0, 0, 0],
+    [0, 0, 0, 1, 0, 0],
+    [0, 0, 0, 0, 1, 0],
+    [0, 0, 0, 0, 0, 1],
+    [0, 0, 1, 1, 0, 0],
+    [0, 0, 0, 0, 1, 1],
+    [0, 0, 1, 0, 1, 0],
+    [0, 0, 0, 1, 0, 1],
+])
+
+
+@pytest.mark.parametrize('max_coverages', [1, 2, 3, 4, 6])
+def test_max_coverages_visits_only_needed_nodes(max_coverages: int):
+    """The last component is searched only until the coverages are enough."""
+    def create_alg(input_matrix, count_only):
+        return ec.EC(input_matrix, count_only=count_only, max_coverages=max_coverages)
+
+    decomposition = components.Decomposition(DenseInputMatrix(MATRIX))
+    result = components.Decomposed(decomposition, create_alg,
+                                   max_coverages=max_coverages).start()
+    assert result.coverage_count == max_coverages
+
+    # The smaller components are searched whole (up to the limit),
+    # and the last one until the product of the coverages is enough.
+    comps = sorted(decomposition.components, key=lambda component: component.shape[0])
+    others = [create_alg(component, False).start() for component in comps[:-1]]
+    combinations = math.prod(len(other.coverages) for other in others)
+    last = ec.EC(comps[-1], max_coverages=math.ceil(max_coverages / combinations)).start()
+
+    assert result.visited_nodes <= sum(other.visited_nodes for other in others) \
+        + last.visited_nodes
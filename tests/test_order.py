@@ -0,0 +1,86 @@
+"""test_order.py
+Checks that the row orders of ec --order are permutations of the rows
+and find the same coverages as the input order, with and without --prune.
+"""
+
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'exact-cover'))
+
+import ec  # pylint: disable=wrong-import-position
+import order  # pylint: disable=wrong-import-position
+from inst import rand  # pylint: disable=wrong-import-position
+from input_matrix import DenseInputMatrix  # pylint: disable=wrong-import-position
+
+SUDOKU = ['4x4x03', '4x4x04']
+SEEDS = [0, 1, 2]
+
+
+def read_sudoku(instance: str):
+    """Returns the input matrix of a sudoku test instance."""
+    input_matrix, _, _ = ec.read_from_file(
+        os.path.join(ROOT, 'test', 'sudoku', f'{instance}.in.txt'))
+    return input_matrix
+
+
+def gen_random(seed: int):
+    """Returns the input matrix of a random instance with a few thousand coverages."""
+    return DenseInputMatrix(rand.gen_inst(12, 60, 0.2, True, seed=seed).input_matrix.astype(int))
+
+
+def coverages(input_matrix, row_order: str, prune: bool) -> set:
+    """Returns the coverages found by EC plus with the rows in the given order,
+    mapped back to the original rows."""
+    rows = order.row_order(input_matrix, row_order)
+    alg = order.Ordered(rows,
+                        ec.ECPlus(order.Ordered.permute(input_matrix, rows),
+                                  use_iterative=True, prune=prune),
+                        row_order)
+    return {tuple(sorted(coverage)) for coverage in alg.start().coverages}
+
+
+@pytest.mark.parametrize('input_matrix', [read_sudoku(instance) for instance in SUDOKU]
+                         + [gen_random(seed) for seed in SEEDS])
+def test_row_order_is_permutation(input_matrix):
+    """Every order lists every row exactly once."""
+    for row_order in order.ORDERS:
+        rows = order.row_order(input_matrix, row_order)
+        assert sorted(rows) == list(range(input_matrix.shape[0])), row_order
+
+
+@pytest.mark.parametrize('prune', [False, True])
+@pytest.mark.parametrize('seed', SEEDS)
+def test_same_coverages_random(seed: int, prune: bool):
+    """Every order finds the same coverages as input on the random instances."""
+    input_matrix = gen_random(seed)
+
+    expected = coverages(input_matrix, 'input', prune)
+    assert expected
+    for row_order in order.ORDERS[1:]:
+        assert coverages(input_matrix, row_order, prune) == expected, row_order
+
+
+@pytest.mark.parametrize('instance', SUDOKU)
+def test_same_coverages_sudoku(instance: str):
+    """Every order finds the same coverages as input on the sudoku instances,
+    with prune as the input order visits millions of nodes without it."""
+    input_matrix = read_sudoku(instance)
+
+    expected = coverages(input_matrix, 'input', True)
+    assert expected
+    for row_order in order.ORDERS[1:]:
+        assert coverages(input_matrix, row_order, True) == expected, row_order
+
+
+@pytest.mark.parametrize('instance', SUDOKU)
+def test_empty_rows_last(instance: str):
+    """The empty rows get the highest indexes in every order."""
+    input_matrix = read_sudoku(instance)
+    empty = [input_matrix.row_empty(i) for i in range(input_matrix.shape[0])]
+
+    for row_order in order.ORDERS[1:]:
+        permuted = [empty[i] for i in order.row_order(input_matrix, row_order)]
+        assert permuted == sorted(permuted), row_order